@@ -1,38 +1,131 @@
 import streamlit as st
-from parsers import AgentA_Parser
+from parsers import AgentA_Parser, EXTRACT_CHAR_BUDGET
 from scout import AgentB_Scout
-from auditor import AgentC_Auditor
+from auditor import AgentC_Auditor, AUDIT_SHARDED
+from pipeline import PipelinePrefetcher
+from research import serialize_research, serialize_passages
+from metrics import start_metrics_server, current_run_id, new_run_id
+from jobs import JobQueue, JOB_WORKERS, start_local_workers
+from dedup import get_syllabus_index, owner_id
+from store import SessionResults, get_result_store
+from deadline import PARTIAL_NOTICE, PIPELINE_DEADLINE_SECONDS, DeadlineExceeded, deadline_scope
 import os
+import time
+from concurrent.futures import TimeoutError as FutureTimeout
 from google.api_core.exceptions import GoogleAPIError
 
 # Constants
 MAX_FILE_SIZE_MB = 10
 MAX_FILE_SIZE_BYTES = MAX_FILE_SIZE_MB * 1024 * 1024
+JOB_POLL_SECONDS = 1
+# Results each job kind replaces; they are dropped on submit so the page polls for the new job
+JOB_RESULT_KEYS = {"analyze": (), "scout": ("web_data", "passages"), "audit": ("final_report",)}
+# Default of the "Deep research" toggle
+DEEP_RESEARCH = os.getenv("DEEP_RESEARCH", "").lower() in ("1", "true", "yes")
+
+# Prometheus endpoint next to the Streamlit server (started once per process)
+start_metrics_server()
 
 # 1. Page Config.
 st.set_page_config(page_title="Universal Syllabus Researcher", layout="wide")
 st.title("Universal Syllabus Researcher")
 st.write("Modernizing any curriculum using Multi-Agent AI (2026 Standards)")
 
-@st.cache_data(show_spinner=False)
-def get_cached_parser_analysis(_parser, text_data, _api_key):
-    # Pass api key to make it recalculate on key change
-    return _parser.analyze_content(text_data)
+# Long-lived agent clients, one per API key, shared by all sessions and reruns
+@st.cache_resource(show_spinner=False, max_entries=32)
+def get_parser(api_key):
+    return AgentA_Parser(api_key)
+
+@st.cache_resource(show_spinner=False, max_entries=32)
+def get_scout(api_key):
+    return AgentB_Scout(api_key)
+
+@st.cache_resource(show_spinner=False, max_entries=32)
+def get_auditor(api_key):
+    return AgentC_Auditor(api_key)
+
+# Agent A and Agent C stream their reports; repeats are served by the agents' persistent response cache
+@st.cache_data(show_spinner=False, max_entries=256, ttl=3600)
+def get_cached_scout_search(_scout, queries, topics, _api_key):
+    return _scout.search_2026(queries, topics=topics)
+
+# Opened on first use, so the worker processes only start once someone submits a job
+@st.cache_resource(show_spinner=False)
+def get_job_queue():
+    queue = JobQueue()
+    # Replicas sharing dedicated workers (see docker-compose.yml) run with JOB_WORKERS=0
+    if JOB_WORKERS:
+        start_local_workers(JOB_WORKERS)
+    return queue
+
+def start_job(kind, payload, secrets):
+    # The worker runs the job under the same per-step time budget as the page would
+    payload = {**payload, "deadline_seconds": st.session_state.get('deadline_seconds') or None}
+    results = session_results()
+    for key in JOB_RESULT_KEYS[kind]:
+        del results[key]
+    # The job id lives in the URL so a refreshed page reattaches to the same job
+    st.query_params[f"{kind}_job"] = get_job_queue().submit(kind, payload, secrets)
+    st.rerun()
+
+def poll_job(kind):
+    """Returns the result of this page's finished job, or None if there is none; otherwise shows progress and reruns."""
+    job_id = st.query_params.get(f"{kind}_job")
+    if not job_id:
+        return None
+    job = get_job_queue().get(job_id)
+    if job is None:
+        del st.query_params[f"{kind}_job"]
+        return None
+    if job['status'] == 'done':
+        result = job['result']
+        if result.get('partial_stages'):
+            # Reports cut short by the worker's deadline are labelled like interactive ones
+            for key in ('report', 'final_report'):
+                if key in result and PARTIAL_NOTICE not in result[key]:
+                    result[key] = f"{result[key]}\n\n{PARTIAL_NOTICE}"
+        return result
+    if job['status'] == 'failed':
+        del st.query_params[f"{kind}_job"]
+        raise Exception(job['error'])
+    st.progress(job['progress'], text=job['stage'] or "Waiting for a free worker...")
+    # Release the script thread between polls instead of blocking on the work itself
+    time.sleep(JOB_POLL_SECONDS)
+    st.rerun()
+
+def step_deadline():
+    # Each agent step gets the whole budget; time the user spends between steps does not count
+    return deadline_scope(st.session_state.get('deadline_seconds') or None)
+
+def label_partial(report, deadline):
+    # Streamed reports already end with the notice; a map step cut short only shows up here
+    if deadline is not None and deadline.partial and PARTIAL_NOTICE not in report:
+        return f"{report}\n\n{PARTIAL_NOTICE}"
+    return report
 
-@st.cache_data(show_spinner=False)
-def get_cached_scout_search(_scout, queries, _api_key):
-    return _scout.search_2026(queries)
+def research_payload(web_data, passages=None):
+    # Prefetched and interactive audits must build identical prompts to share cached reports
+    payload, _ = serialize_research(web_data)
+    return payload + serialize_passages(passages)
 
-@st.cache_data(show_spinner=False)
-def get_cached_audit_report(_auditor, syllabus_info, web_info, _api_key):
-    return _auditor.generate_audit_report(syllabus_info, web_info)
 
+def session_results():
+    # Reports and findings live in the bounded result store under an id kept in the URL, so a refresh finds them again
+    if "sid" not in st.query_params:
+        st.query_params["sid"] = new_run_id()
+    # Scoped to the API key too, so a copied link alone neither shows nor clears another user's results
+    return SessionResults(get_result_store(), f"{owner_id(st.session_state.get('google_api_key', ''))}:{st.query_params['sid']}")
 
 def clear_session():
     # Clear session state when a new file is uploaded or reset is clicked
+    session_results().clear()
     for key in list(st.session_state.keys()):
-        if key not in ['google_api_key', 'serper_api_key']:
+        if key == 'prefetch':
+            st.session_state[key].cancel()
+        if key not in ['google_api_key', 'serper_api_key', 'pipelined_mode', 'background_jobs', 'deadline_seconds', 'deep_research', 'sharded_audit']:
             del st.session_state[key]
+    # Detach from any background jobs of the previous document
+    st.query_params.clear()
 
 # 2. Side bar for instructions & Configuration
 with st.sidebar:
@@ -52,6 +145,13 @@ with st.sidebar:
     if not google_api_key or not serper_api_key:
         st.warning("⚠️ Please provide both API keys to proceed.")
 
+    st.toggle("Pipelined mode", key="pipelined_mode", help="Start Agent B and Agent C in the background as soon as Agent A finishes. The results are used if you keep the suggested queries unchanged.")
+    st.toggle("Background jobs", key="background_jobs", help="Run the agents in worker processes. The page polls for progress, and refreshing it reattaches to the running job.")
+    st.number_input("Time budget per step (seconds)", min_value=0, value=int(PIPELINE_DEADLINE_SECONDS), step=15, key="deadline_seconds",
+                    help="Each agent step returns what it has, labelled as partial, once this budget is spent. 0 means no budget.")
+    st.toggle("Deep research", value=DEEP_RESEARCH, key="deep_research", help="After searching, Agent B also reads the top result pages and passes their most relevant passages to Agent C.")
+    st.toggle("Sharded audit", value=AUDIT_SHARDED, key="sharded_audit", help="Agent C writes the report's sections concurrently as separate calls. Faster, but each call re-sends the syllabus and research, so it uses about 6x the prompt tokens.")
+
     st.markdown("---")
     st.header("How to Use")
     st.info("Upload any PDF or PPTX syllabus. Agent A will parse it and identify the subject automatically")
@@ -62,7 +162,8 @@ with st.sidebar:
         
     st.markdown("---")
     st.subheader("Privacy Policy & Terms")
-    st.caption("By using this tool, you acknowledge that uploaded documents are temporarily processed by Google (Gemini) and Serper APIs for analysis and are not permanently stored by this application.")
+    st.caption("By using this tool, you acknowledge that uploaded documents are temporarily processed by Google (Gemini) and Serper APIs for analysis and are not permanently stored by this application. "
+               "Agent A's report (not the document itself) is kept for reuse with near-identical uploads made with the same API key.")
 
 # Stop execution if API keys are missing
 if not st.session_state['google_api_key'] or not st.session_state['serper_api_key']:
@@ -81,34 +182,90 @@ if not agree_to_terms:
 st.info("💡 **Tip:** Don't have a syllabus right now? Try uploading a sample PDF to test the app!")
 uploaded_file = st.file_uploader(f"Upload Syllabus (PDF or PPTX, Max {MAX_FILE_SIZE_MB}MB)", type=["pdf", "pptx"], on_change=clear_session)
 
-if uploaded_file:
-    if uploaded_file.size > MAX_FILE_SIZE_BYTES:
+results = session_results()
+
+# A refreshed page has lost its upload but can still show its results or reattach to its background jobs
+if uploaded_file or st.query_params.get("analyze_job") or 'agent_a_report' in results:
+    if uploaded_file and uploaded_file.size > MAX_FILE_SIZE_BYTES:
         st.error(f"❌ File size exceeds {MAX_FILE_SIZE_MB}MB limit. Please upload a smaller file.")
         st.stop()
 
+    # Tag this run's trace spans with an id that lives as long as the uploaded document
+    current_run_id.set(st.session_state.setdefault('run_id', new_run_id()))
+
+    # Offer Agent A's report of a near-identical syllabus analysed earlier
+    if 'syllabus_match' in st.session_state and 'agent_a_report' not in results:
+        match = st.session_state['syllabus_match']
+        # File names are not shown: an API key from the environment is shared by every visitor
+        st.info(f"♻️ This document is {match['similarity']:.0%} similar to a syllabus analysed earlier with this API key. "
+                "You can reuse that report instead of analysing this one again.")
+        reuse_col, analyse_col = st.columns(2)
+        if reuse_col.button("Reuse Previous Report"):
+            results['agent_a_report'] = match['report']
+            results['agent_a_queries'] = match['queries']
+            results['agent_a_topics'] = match['topics']
+            del st.session_state['syllabus_match']
+            st.rerun()
+        if analyse_col.button("Analyse Anyway"):
+            st.session_state['skip_similar'] = True
+            del st.session_state['syllabus_match']
+            st.rerun()
+        st.stop()
+
     # Agent A Processing
-    if 'agent_a_report' not in st.session_state:
+    if 'agent_a_report' not in results:
         try:
-            parser = AgentA_Parser(st.session_state['google_api_key'])
-            with st.status("Agent A is working...", expanded=True) as status:
-                st.write("Reading file contents...")
-                text_data = parser.extract_text(uploaded_file)
-                
-                if not text_data.strip():
-                    status.update(label="Parsing failed!", state="error", expanded=True)
-                    st.error("No extractable text found in the document. It might be scanned or image-based.")
-                    st.stop()
+            job_result = poll_job("analyze")
+            if job_result is not None:
+                report, queries, topics = job_result['report'], job_result['queries'], job_result['topics']
+            else:
+                parser = get_parser(st.session_state['google_api_key'])
+                with step_deadline() as deadline, st.status("Agent A is working...", expanded=True) as status:
+                    st.write("Reading file contents...")
+                    # Stop reading once Agent A's input budget is full
+                    text_data = parser.extract_text(uploaded_file, char_budget=EXTRACT_CHAR_BUDGET)
+                    
+                    if not text_data.strip():
+                        status.update(label="Parsing failed!", state="error", expanded=True)
+                        st.error("No extractable text found in the document. It might be scanned or image-based.")
+                        st.stop()
 
-                st.write("Performing Semantic Analysis...")
-                report = get_cached_parser_analysis(parser, text_data, st.session_state['google_api_key'])
-                
-                # Extract initial queries
-                queries = parser.get_search_queries(report)
-                
-                status.update(label="Agent A Analysis Complete!", state="complete", expanded=False)
+                    if not st.session_state.get('skip_similar'):
+                        match = get_syllabus_index().find(text_data, owner_id(st.session_state['google_api_key']))
+                        if match is not None:
+                            st.session_state['syllabus_match'] = match
+                            st.rerun()
+
+                    if st.session_state.get('background_jobs'):
+                        start_job("analyze", {"text": text_data}, {"google_api_key": st.session_state['google_api_key']})
+
+                    st.write("Performing Semantic Analysis...")
+                    # Render tokens as they arrive; write_stream returns the assembled report
+                    report = label_partial(st.write_stream(parser.analyze_content_stream(text_data)), deadline)
+                    
+                    # Extract initial queries
+                    queries = parser.get_search_queries(report)
+                    
+                    status.update(label="Agent A Analysis Complete!", state="complete", expanded=False)
+                topics = parser.get_core_topics(report)
+                if not deadline or not deadline.partial:
+                    get_syllabus_index().add(text_data, report, queries, topics, owner_id(st.session_state['google_api_key']))
                 
-            st.session_state['agent_a_report'] = report
-            st.session_state['agent_a_queries'] = queries
+            results['agent_a_report'] = report
+            results['agent_a_queries'] = queries
+            results['agent_a_topics'] = topics
+
+            if st.session_state.get('pipelined_mode') and queries:
+                # Speculatively scout and audit while the user reviews the queries
+                st.session_state['prefetch'] = PipelinePrefetcher(
+                    get_scout(st.session_state['serper_api_key']),
+                    get_auditor(st.session_state['google_api_key']),
+                    report,
+                    research_payload,
+                    topics=results['agent_a_topics'],
+                    sharded_audit=st.session_state.get('sharded_audit'),
+                    deep_research=bool(st.session_state.get('deep_research')),
+                ).start(queries)
             st.rerun()
         except GoogleAPIError as e:
             st.error(f"❌ Gemini API Error: Please check your API key or quota. Details: {e}")
@@ -118,10 +275,10 @@ if uploaded_file:
             st.stop()
 
     # Display Agent A Findings and HitL Queries
-    if 'agent_a_report' in st.session_state:
+    if 'agent_a_report' in results:
         st.divider()
         st.subheader("Agent A: Parser Report")
-        st.markdown(st.session_state['agent_a_report'])
+        st.markdown(results['agent_a_report'])
         st.success("Data ready for Agent B (The Scout)!")
         
         # HitL: Human in the Loop for Queries
@@ -130,54 +287,129 @@ if uploaded_file:
         st.caption("ℹ️ **Tip:** Good queries are specific, include the year '2026', and focus on industry trends rather than basic definitions.")
         
         # Form or text area to edit queries
-        queries_text = "\n".join(st.session_state['agent_a_queries'])
+        queries_text = "\n".join(results['agent_a_queries'])
         edited_queries_text = st.text_area("Research Queries (One per line)", value=queries_text, height=100)
         edited_queries = [q.strip() for q in edited_queries_text.split('\n') if q.strip()]
 
+        # Editing the queries or toggling deep research supersedes any speculative work started for the originals
+        prefetch = st.session_state.get('prefetch')
+        if prefetch is not None and (not prefetch.matches(edited_queries) or prefetch.deep_research != bool(st.session_state.get('deep_research'))):
+            prefetch.cancel()
+            del st.session_state['prefetch']
+            prefetch = None
+
         if st.button("Let Agent B Scout 2026 Trends"):
-            st.session_state['final_queries'] = edited_queries
+            results['final_queries'] = edited_queries
+            if st.session_state.get('background_jobs'):
+                start_job("scout", {"queries": edited_queries, "topics": results['agent_a_topics'], "deep": bool(st.session_state.get('deep_research'))},
+                          {"serper_api_key": st.session_state['serper_api_key']})
+            try:
+                with step_deadline() as deadline, st.spinner("Agent B is searching the live web..."):
+                    if prefetch is not None:
+                        try:
+                            web_data, passages = prefetch.scout_result(deadline.remaining() if deadline else None)
+                        except FutureTimeout:
+                            raise DeadlineExceeded("The prefetched search did not finish within the time budget.")
+                    else:
+                        scout = get_scout(st.session_state['serper_api_key'])
+                        web_data = get_cached_scout_search(scout, results['final_queries'], results['agent_a_topics'], st.session_state['serper_api_key'])
+                        if deadline and deadline.partial:
+                            # Timed-out queries should be searched again next time, not served from the cache
+                            get_cached_scout_search.clear(scout, results['final_queries'], results['agent_a_topics'], st.session_state['serper_api_key'])
+                        passages = None
+                        if st.session_state.get('deep_research'):
+                            passages = scout.deep_research(results['final_queries'], topics=results['agent_a_topics'])
+                    if passages is not None:
+                        results['passages'] = passages
+                    else:
+                        del results['passages']
+                    results['web_data'] = web_data
+            except Exception as e:
+                st.error(f"❌ Error during web search: {e}. Please check your Serper API Key.")
+
+        if 'web_data' not in results:
             try:
-                scout = AgentB_Scout(st.session_state['serper_api_key'])
-                with st.spinner("Agent B is searching the live web..."):
-                    web_data = get_cached_scout_search(scout, st.session_state['final_queries'], st.session_state['serper_api_key'])
-                    st.session_state['web_data'] = web_data
+                job_result = poll_job("scout")
+                if job_result is not None:
+                    if 'passages' in job_result:
+                        results['passages'] = job_result['passages']
+                    results['web_data'] = job_result['web_data']
             except Exception as e:
                 st.error(f"❌ Error during web search: {e}. Please check your Serper API Key.")
 
     # Display Agent B Findings
-    if 'web_data' in st.session_state:
+    if 'web_data' in results:
+        web_data = results['web_data']
         st.divider()
         st.subheader("Agent B: Real-Time Findings")
-        for res in st.session_state['web_data']:
+        for res in web_data:
             st.write(f"**Query:** {res['query']}")
             for f in res['findings']:
                 st.write(f"- {f}")
 
+        passages = results.get('passages')
+        if passages:
+            with st.expander(f"Full-page evidence ({len(passages)} passages)"):
+                for passage in passages:
+                    st.markdown(f"**{passage['url']}**\n\n{passage['text']}")
+
+        _, research_stats = serialize_research(web_data)
+        st.caption(f"Research payload for Agent C: ~{research_stats['payload_tokens']} tokens "
+                   f"({research_stats['saved_tokens']} saved, {research_stats['duplicates_removed']} duplicate snippets removed).")
+
         # Final Audit Step
         if st.button("Run Final Audit (Agent C)"):
             try:
-                auditor = AgentC_Auditor(st.session_state['google_api_key'])
-                syllabus_info = st.session_state['agent_a_report']
-                web_info = str(st.session_state['web_data'])
-                
-                with st.spinner("Agent C is auditing the curriculum gap..."):
-                    final_report = get_cached_audit_report(auditor, syllabus_info, web_info, st.session_state['google_api_key'])
+                with step_deadline() as deadline:
+                    auditor = get_auditor(st.session_state['google_api_key'])
+                    syllabus_info = results['agent_a_report']
+                    web_info = research_payload(web_data, passages)
+                    if st.session_state.get('background_jobs'):
+                        start_job("audit", {"report": syllabus_info, "web_info": web_info, "sharded": bool(st.session_state.get('sharded_audit'))},
+                                  {"google_api_key": st.session_state['google_api_key']})
+
+                    final_report = None
+                    prefetch = st.session_state.get('prefetch')
+                    # A live prefetch supplied this page's findings and passages, so its audit used the same research
+                    if prefetch is not None and prefetch.matches(results.get('final_queries', [])):
+                        with st.spinner("Agent C is finishing the prefetched audit..."):
+                            try:
+                                final_report = prefetch.audit_result(deadline.remaining() if deadline else None)
+                            except Exception:
+                                # Fall back to a regular audit below
+                                final_report = None
+
+                    if final_report is None:
+                        # Stream the audit into a temporary placeholder; the full report is rendered below once stored
+                        stream_box = st.empty()
+                        with stream_box.container():
+                            st.caption("Agent C is auditing the curriculum gap...")
+                            final_report = label_partial(st.write_stream(auditor.generate_audit_report_stream(syllabus_info, web_info, sharded=st.session_state.get('sharded_audit'))), deadline)
+                        stream_box.empty()
                 
-                st.session_state['final_report'] = final_report
+                    results['final_report'] = final_report
             except GoogleAPIError as e:
                 st.error(f"❌ Gemini API Error during audit: {e}. Please check quota/key.")
             except Exception as e:
                 st.error(f"❌ Unexpected error during final audit: {e}")
 
+        if 'final_report' not in results:
+            try:
+                job_result = poll_job("audit")
+                if job_result is not None:
+                    results['final_report'] = job_result['final_report']
+            except Exception as e:
+                st.error(f"❌ Unexpected error during final audit: {e}")
+
     # Display Agent C Report and Download
-    if 'final_report' in st.session_state:
+    if 'final_report' in results:
         st.divider()
         st.header("Final Modernization Report")
-        st.markdown(st.session_state['final_report'])
+        st.markdown(results['final_report'])
 
         st.download_button(
             label="Download Report as Markdown",
-            data=st.session_state['final_report'],
+            data=results['final_report'],
             file_name="final_modernization_report.md",
             mime="text/markdown"
         )
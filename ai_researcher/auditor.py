@@ -1,19 +1,149 @@
-import google.generativeai as genai
+import os
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
 from google.api_core.exceptions import GoogleAPIError
-from tenacity import retry, wait_exponential, stop_after_attempt, retry_if_exception_type
+from gemini import GeminiAgent
+from metrics import instrument
+from deadline import DeadlineExceeded, PARTIAL_NOTICE, current_deadline, mark_partial, propagate
+
+# Sharded mode writes the report's sections as concurrent, individually cached calls. It is
+# opt-in: every section re-sends the syllabus and research, so it costs ~6x the prompt tokens
+AUDIT_SHARDED = os.getenv("AUDIT_SHARDED", "").lower() in ("1", "true", "yes")
+SHARD_WORKERS = int(os.getenv("AUDIT_SHARD_WORKERS", 6))
+
+# (heading, task) per section, in report order; each section needs only the shared inputs
+AUDIT_SECTIONS = [
+    ("Executive Summary & Industry Alignment", """Write a short executive summary of the syllabus' overall fitness for 2026, then evaluate
+how well it prepares students for:
+    • Entry-level jobs
+    • Internships
+    • Competitive tech roles
+    • Higher studies"""),
+    ("Gap Analysis", """Identify important skills, tools, frameworks, technologies, or methodologies
+present in Industry Research but missing in the syllabus.
+Present them as a table, classifying each gap as:
+    • Critical (Must Add Immediately)
+    • Important (Should Add)
+    • Emerging (Future-Relevant)"""),
+    ("Stale / Outdated Content", """Identify topics in the syllabus that are technologically outdated, in low industry demand,
+or replaced by modern alternatives. Present them as a table with a modern replacement for each (if applicable)."""),
+    ("Skill Relevance Scoring", """Provide a 0-10 relevance score for major syllabus modules based on 2026 industry demand,
+as a table, and briefly justify each score."""),
+    ("Strategic Action Plan", """Provide a structured roadmap for the professor:
+    • Immediate changes (0-3 months)
+    • Short-term upgrades (3-6 months)
+    • Long-term modernization (6-12 months)"""),
+    ("Additional Recommendations", """Suggest:
+    • Capstone project ideas aligned with 2026 trends
+    • Practical tools/platforms to introduce
+    • Certifications worth integrating
+    • Industry collaboration opportunities
+End with a one-paragraph final recommendation."""),
+]
+
+
+class AgentC_Auditor(GeminiAgent):
+    stage = 'audit'
+
+    def __init__(self, api_key: str, sharded=AUDIT_SHARDED):
+        super().__init__(api_key)
+        self.sharded = sharded
+
+    @instrument("audit")
+    def generate_audit_report(self, syllabus_analysis, web_research, sharded=None):
+        """Compares syllabus with live web data to find gaps and modernization strategy.
+
+        sharded overrides the auditor's default for this report.
+        """
+        try:
+            if self.sharded if sharded is None else sharded:
+                return "".join(self._sharded_report(syllabus_analysis, web_research))
+            return self._generate(self._audit_prompt(syllabus_analysis, web_research))
+        except (GoogleAPIError, DeadlineExceeded):
+            raise
+        except Exception as e:
+            raise Exception(f"Auditor failed to generate report: {str(e)}")
+
+    @instrument("audit")
+    def generate_audit_report_stream(self, syllabus_analysis, web_research, sharded=None):
+        """Same as generate_audit_report, but yields the report in chunks as Gemini writes it."""
+        try:
+            if self.sharded if sharded is None else sharded:
+                yield from self._sharded_report(syllabus_analysis, web_research)
+            else:
+                yield from self._generate_stream(self._audit_prompt(syllabus_analysis, web_research))
+        except (GoogleAPIError, DeadlineExceeded):
+            raise
+        except Exception as e:
+            raise Exception(f"Auditor failed to generate report: {str(e)}")
+
+    def _sharded_report(self, syllabus_analysis, web_research):
+        """Yields the report section by section, in AUDIT_SECTIONS order, each as soon as it is ready.
+
+        The sections are generated concurrently and cached one by one, so after a failure
+        only the failed sections are generated again. If the first section fails for any
+        reason other than the deadline, the report falls back to the single-call prompt;
+        a later failure only replaces that section with a note, as the earlier ones are out.
+        """
+        deadline = current_deadline.get()
+        pool = ThreadPoolExecutor(max_workers=min(SHARD_WORKERS, len(AUDIT_SECTIONS)))
+        try:
+            generate = propagate(self._generate)
+            futures = [
+                pool.submit(generate, self._section_prompt(syllabus_analysis, web_research, heading, task))
+                for heading, task in AUDIT_SECTIONS
+            ]
+            missing = False
+            for index, ((heading, _), future) in enumerate(zip(AUDIT_SECTIONS, futures)):
+                try:
+                    section = future.result(timeout=deadline.remaining() if deadline is not None else None).strip()
+                except (FutureTimeout, DeadlineExceeded):
+                    mark_partial(self.stage)
+                    missing = True
+                    section = "(Not written: the time budget ran out before this section was complete.)"
+                except Exception as e:
+                    if index == 0:
+                        yield from self._generate_stream(self._audit_prompt(syllabus_analysis, web_research))
+                        return
+                    mark_partial(self.stage)
+                    missing = True
+                    section = f"(Not written: this section failed: {e})"
+                yield f"## {heading}\n\n{section}\n\n"
+            if missing:
+                yield PARTIAL_NOTICE
+        finally:
+            # Sections still running when the budget is spent (or the reader stops) are left behind
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def _section_prompt(self, syllabus_analysis, web_research, heading, task):
+        # The preamble and inputs are identical across sections; only the task differs
+        return f"""
+You are Agent C – Senior Academic Curriculum Auditor (2026 Industry Standards Specialist).
 
-class AgentC_Auditor:
-    def __init__(self, api_key: str):
-        if not api_key:
-            raise ValueError("Google API Key is required.")
-        genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel('gemini-3-flash-preview')
+You are writing one section of an Academic Audit Report that compares the current syllabus
+with 2026 global industry standards, job market trends, and emerging technologies.
 
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=2, min=4, max=15), retry=retry_if_exception_type(GoogleAPIError))
-    def generate_audit_report(self, syllabus_analysis, web_research):
-        """Compares syllabus with live web data to find gaps and modernization strategy."""
+------------------------------
+INPUT DATASET 1: CURRENT SYLLABUS
+------------------------------
+{syllabus_analysis}
+
+------------------------------
+INPUT DATASET 2: 2026 INDUSTRY & MARKET RESEARCH
+------------------------------
+{web_research}
 
-        prompt = f"""
+==============================
+SECTION: {heading.upper()}
+==============================
+{task}
+
+Write only this section's body, without the section heading and without an introduction.
+Keep the tone professional, data-driven, and solution-oriented.
+Avoid generic statements. Be specific and actionable.
+"""
+
+    def _audit_prompt(self, syllabus_analysis, web_research):
+        return f"""
 You are Agent C – Senior Academic Curriculum Auditor (2026 Industry Standards Specialist).
 
 Your responsibility is to critically evaluate, modernize, and strategically upgrade the curriculum
@@ -98,9 +228,3 @@ Generate a formal, structured Academic Audit Report with:
 Keep the tone professional, data-driven, and solution-oriented.
 Avoid generic statements. Be specific and actionable.
 """
-
-        try:
-            response = self.model.generate_content(prompt)
-            return response.text
-        except Exception as e:
-            raise Exception(f"Auditor failed to generate report: {str(e)}")
\ No newline at end of file
@@ -0,0 +1,289 @@
+"""Headless batch runner for the Agent A -> B -> C pipeline.
+
+Audits every PDF/PPTX in a directory (or matching a glob) without the Streamlit UI
+and appends one JSON line per document to the output file as soon as it finishes.
+Re-running with the same output file resumes after a crash: documents that already
+have a successful record are skipped.
+
+Usage:
+    python batch.py syllabi/ --output results.jsonl --parse-workers 4 --scout-workers 4 --audit-workers 2
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from parsers import AgentA_Parser, EXTRACT_CHAR_BUDGET, is_truncated
+from scout import AgentB_Scout
+from auditor import AgentC_Auditor, AUDIT_SHARDED
+from research import serialize_research, serialize_passages
+from dedup import get_syllabus_index, owner_id
+from planner import QueryPlanner
+from deadline import Deadline, DeadlineExceeded, deadline_scope
+from metrics import start_metrics_server, current_run_id
+
+SUPPORTED_EXTENSIONS = (".pdf", ".pptx")
+STAGES = ("extract", "analyze", "scout", "audit")
+
+
+def discover_documents(source):
+    """Returns the sorted list of supported documents in a directory or matching a glob pattern."""
+    if os.path.isdir(source):
+        pattern = os.path.join(source, "**", "*")
+    else:
+        pattern = source
+    paths = glob.glob(pattern, recursive=True)
+    return sorted(p for p in paths if os.path.isfile(p) and p.lower().endswith(SUPPORTED_EXTENSIONS))
+
+
+def load_checkpoint(output_path):
+    """Returns the documents that already have a successful record in the output file."""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A crash can leave a truncated last line behind
+                continue
+            if record.get("status") == "ok":
+                done.add(record["path"])
+    return done
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[rank]
+
+
+class BatchRunner:
+    """Runs documents through separate worker pools per stage, so stages overlap across documents."""
+
+    def __init__(self, google_api_key, serper_api_key, output_path, parse_workers=4, scout_workers=4, audit_workers=2, reuse_similar=True, deadline_seconds=None, deep_research=False, share_queries=True, sharded_audit=AUDIT_SHARDED):
+        self.parser = AgentA_Parser(google_api_key)
+        self.scout = AgentB_Scout(serper_api_key)
+        self.auditor = AgentC_Auditor(google_api_key, sharded=sharded_audit)
+        self.output_path = output_path
+        self.parse_workers = parse_workers
+        self.scout_workers = scout_workers
+        self.audit_workers = audit_workers
+        self.reuse_similar = reuse_similar
+        self.index_owner = owner_id(google_api_key)
+        self.deadline_seconds = deadline_seconds
+        self.deep_research = deep_research
+        # Near-duplicate queries across the batch's documents are searched once
+        self.planner = QueryPlanner(self.scout) if share_queries else None
+        # One end-to-end deadline per document, shared by its stages
+        self._deadlines = {}
+        self.timings = {stage: [] for stage in STAGES}
+        self.succeeded = 0
+        # Cut short by the deadline; kept apart from errors, and redone on the next run like them
+        self.partial = 0
+        self.failed = 0
+        self._lock = threading.Lock()
+        self._remaining = 0
+        self._finished = threading.Event()
+
+    @contextmanager
+    def _timed(self, stage, record):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            record["timings"][stage] = round(elapsed, 3)
+            with self._lock:
+                self.timings[stage].append(elapsed)
+
+    def run(self, paths):
+        """Processes all paths and blocks until every document has a record."""
+        if not paths:
+            return
+        self._remaining = len(paths)
+        self._finished.clear()
+        self.started_at = time.perf_counter()
+
+        with ThreadPoolExecutor(self.parse_workers, thread_name_prefix="parse") as self._parse_pool, \
+                ThreadPoolExecutor(self.scout_workers, thread_name_prefix="scout") as self._scout_pool, \
+                ThreadPoolExecutor(self.audit_workers, thread_name_prefix="audit") as self._audit_pool, \
+                open(self.output_path, "a", encoding="utf-8") as self._output:
+            for path in paths:
+                record = {"path": path, "status": "running", "timings": {}}
+                self._parse_pool.submit(self._guard, self._parse_stage, record)
+            self._finished.wait()
+
+        self.elapsed = time.perf_counter() - self.started_at
+
+    def _guard(self, stage_fn, record):
+        current_run_id.set(os.path.basename(record["path"]))
+        if self.deadline_seconds and record["path"] not in self._deadlines:
+            self._deadlines[record["path"]] = Deadline(self.deadline_seconds)
+        try:
+            with deadline_scope(self._deadlines.get(record["path"])):
+                stage_fn(record)
+        except DeadlineExceeded as e:
+            # Whatever the earlier stages produced stays in the record
+            record["status"] = "partial"
+            record["error"] = str(e)
+            self._finish(record)
+        except Exception as e:
+            record["status"] = "error"
+            record["error"] = str(e)
+            self._finish(record)
+
+    def _parse_stage(self, record):
+        record["stage"] = "extract"
+        with self._timed("extract", record):
+            with open(record["path"], "rb") as f:
+                text_data = self.parser.extract_text(f, char_budget=EXTRACT_CHAR_BUDGET)
+        if not text_data.strip():
+            raise Exception("No extractable text found in the document.")
+        if is_truncated(text_data):
+            record["truncated"] = True
+
+        record["stage"] = "analyze"
+        match = get_syllabus_index().find(text_data, self.index_owner) if self.reuse_similar else None
+        if match is not None:
+            # A near-identical syllabus (e.g. last semester's) was already analysed
+            record["agent_a_report"] = match["report"]
+            record["queries"] = match["queries"]
+            record["topics"] = match["topics"]
+            record["reused_from"] = {"name": match["name"], "similarity": round(match["similarity"], 3)}
+        else:
+            with self._timed("analyze", record):
+                record["agent_a_report"] = self.parser.analyze_content(text_data)
+            record["queries"] = self.parser.get_search_queries(record["agent_a_report"])
+            record["topics"] = self.parser.get_core_topics(record["agent_a_report"])
+            deadline = self._deadlines.get(record["path"])
+            if deadline is None or not deadline.partial:
+                get_syllabus_index().add(text_data, record["agent_a_report"], record["queries"], record["topics"], self.index_owner, name=record["path"])
+        self._scout_pool.submit(self._guard, self._scout_stage, record)
+
+    def _scout_stage(self, record):
+        record["stage"] = "scout"
+        with self._timed("scout", record):
+            if self.planner is not None:
+                record["web_data"] = self.planner.search(record["queries"], topics=record["topics"])
+                searched = self.planner.plan(record["queries"])
+            else:
+                record["web_data"] = self.scout.search_2026(record["queries"], topics=record["topics"])
+                searched = record["queries"]
+            if self.deep_research:
+                record["passages"] = self.scout.deep_research(searched, topics=record["topics"])
+        self._audit_pool.submit(self._guard, self._audit_stage, record)
+
+    def _audit_stage(self, record):
+        record["stage"] = "audit"
+        with self._timed("audit", record):
+            # Same payload format as app.py, so both share cached audits
+            web_info, record["research_stats"] = serialize_research(record["web_data"])
+            web_info += serialize_passages(record.get("passages"))
+            record["final_report"] = self.auditor.generate_audit_report(record["agent_a_report"], web_info)
+        record["status"] = "ok"
+        del record["stage"]
+        self._finish(record)
+
+    def _finish(self, record):
+        deadline = self._deadlines.pop(record["path"], None)
+        if deadline is not None and deadline.partial:
+            record["partial_stages"] = deadline.partial_stages
+            if record["status"] == "ok":
+                record["status"] = "partial"
+        with self._lock:
+            # Flush every record so a crash loses at most the documents still in flight
+            self._output.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self._output.flush()
+            if record["status"] == "ok":
+                self.succeeded += 1
+            elif record["status"] == "partial":
+                self.partial += 1
+            else:
+                self.failed += 1
+            self._remaining -= 1
+            if self._remaining == 0:
+                self._finished.set()
+
+    def summary(self):
+        """Returns a human-readable throughput report."""
+        processed = self.succeeded + self.partial + self.failed
+        minutes = self.elapsed / 60 if self.elapsed else 0
+        lines = [
+            f"Processed {processed} documents ({self.succeeded} ok, {self.partial} partial, {self.failed} failed) in {self.elapsed:.1f}s",
+            f"Throughput: {processed / minutes if minutes else 0:.2f} docs/min",
+        ]
+        for stage in STAGES:
+            values = self.timings[stage]
+            lines.append(f"  {stage:<8} n={len(values):<5} p50={percentile(values, 50):.2f}s p95={percentile(values, 95):.2f}s")
+        if self.planner is not None:
+            plan = self.planner.stats()
+            lines.append(f"Queries: {plan['requested']} requested, {plan['searched']} searched ({plan['clusters']} distinct)")
+        return "\n".join(lines)
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Audit a directory of syllabi with Agents A, B and C.")
+    arg_parser.add_argument("source", help="Directory to scan recursively, or a glob such as 'syllabi/*.pdf'")
+    arg_parser.add_argument("--output", default="results.jsonl", help="JSONL file that records are appended to")
+    arg_parser.add_argument("--parse-workers", type=int, default=4, help="Concurrent extraction + Agent A analyses")
+    arg_parser.add_argument("--scout-workers", type=int, default=4, help="Concurrent Agent B searches")
+    arg_parser.add_argument("--audit-workers", type=int, default=2, help="Concurrent Agent C audits")
+    arg_parser.add_argument("--metrics-port", type=int, default=0, help="Serve Prometheus metrics on this port while running")
+    arg_parser.add_argument("--no-resume", action="store_true", help="Process every document even if it already has a record")
+    arg_parser.add_argument("--deadline-seconds", type=float, default=None, help="End-to-end time budget per document; late stages return partial results")
+    arg_parser.add_argument("--no-reuse", action="store_true", help="Analyse every document even if a near-identical one was analysed before")
+    arg_parser.add_argument("--deep-research", action="store_true", help="Also read the top result pages and pass their best passages to Agent C")
+    arg_parser.add_argument("--no-shared-queries", action="store_true", help="Search every document's queries separately instead of once per batch")
+    arg_parser.add_argument("--sharded-audit", action="store_true", help="Write each audit's sections as concurrent calls (about 6x the prompt tokens)")
+    args = arg_parser.parse_args(argv)
+
+    google_api_key = os.getenv("GOOGLE_API_KEY", "")
+    serper_api_key = os.getenv("SERPER_API_KEY", "")
+    if not google_api_key or not serper_api_key:
+        print("GOOGLE_API_KEY and SERPER_API_KEY must be set.", file=sys.stderr)
+        return 2
+
+    paths = discover_documents(args.source)
+    if not args.no_resume:
+        done = load_checkpoint(args.output)
+        skipped = [p for p in paths if p in done]
+        paths = [p for p in paths if p not in done]
+        if skipped:
+            print(f"Resuming: skipping {len(skipped)} documents already in {args.output}")
+
+    if not paths:
+        print("Nothing to do.")
+        return 0
+
+    start_metrics_server(args.metrics_port)
+
+    runner = BatchRunner(
+        google_api_key,
+        serper_api_key,
+        args.output,
+        parse_workers=args.parse_workers,
+        scout_workers=args.scout_workers,
+        audit_workers=args.audit_workers,
+        reuse_similar=not args.no_reuse,
+        deadline_seconds=args.deadline_seconds,
+        deep_research=args.deep_research,
+        share_queries=not args.no_shared_queries,
+        sharded_audit=args.sharded_audit or AUDIT_SHARDED,
+    )
+    runner.run(paths)
+    print(runner.summary())
+    # Partial results are what --deadline-seconds asks for, so only errors fail the run
+    return 1 if runner.failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
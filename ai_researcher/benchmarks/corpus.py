@@ -0,0 +1,99 @@
+"""Generates a synthetic corpus of syllabus PDFs and PPTXs at several sizes."""
+import os
+import random
+import zlib
+from pptx import Presentation
+from pptx.util import Inches
+
+# Pages (PDF) or slides (PPTX) per size class
+SIZES = {"small": 5, "medium": 40, "large": 250}
+
+WORDS = (
+    "learning model data network analysis system theory method algorithm design optimisation "
+    "probability statistics regression classification security cloud database graph module "
+    "assessment project lab lecture tutorial evaluation research application framework"
+).split()
+
+
+def _page_lines(rng, page, lines=40, words_per_line=12):
+    heading = f"Module {page + 1}: {rng.choice(WORDS).title()} {rng.choice(WORDS).title()}"
+    body = [" ".join(rng.choice(WORDS) for _ in range(words_per_line)) for _ in range(lines)]
+    return [heading] + body
+
+
+def _escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(path, pages, seed=0):
+    """Writes a minimal text PDF (Helvetica, one content stream per page) without extra dependencies."""
+    rng = random.Random(seed)
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>"]
+    kids = " ".join(f"{3 + 2 * i} 0 R" for i in range(pages))
+    objects.append(f"<< /Type /Pages /Kids [{kids}] /Count {pages} >>")
+    font_id = 3 + 2 * pages
+    streams = []
+    for page in range(pages):
+        lines = _page_lines(rng, page)
+        ops = ["BT", "/F1 9 Tf", "11 TL", "40 760 Td"]
+        ops.extend(f"({_escape(line)}) '" for line in lines)
+        ops.append("ET")
+        stream = "\n".join(ops)
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents {4 + 2 * page} 0 R "
+            f"/Resources << /Font << /F1 {font_id} 0 R >> >> >>"
+        )
+        objects.append(None)
+        streams.append(stream)
+    objects.append("<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    stream_iter = iter(streams)
+    for number, obj in enumerate(objects, start=1):
+        offsets.append(len(out))
+        if obj is None:
+            data = next(stream_iter).encode("latin-1")
+            body = b"<< /Length %d >>\nstream\n" % len(data) + data + b"\nendstream"
+        else:
+            body = obj.encode("latin-1")
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def write_pptx(path, slides, seed=0):
+    """Writes a deck with a title, a bulleted body and speaker notes on every slide."""
+    rng = random.Random(seed)
+    prs = Presentation()
+    layout = prs.slide_layouts[1]
+    for slide_index in range(slides):
+        lines = _page_lines(rng, slide_index, lines=8)
+        slide = prs.slides.add_slide(layout)
+        slide.shapes.title.text = lines[0]
+        slide.placeholders[1].text = "\n".join(lines[1:])
+        box = slide.shapes.add_textbox(Inches(1), Inches(6.5), Inches(8), Inches(0.5))
+        box.text_frame.text = " ".join(rng.choice(WORDS) for _ in range(10))
+        slide.notes_slide.notes_text_frame.text = " ".join(rng.choice(WORDS) for _ in range(30))
+    prs.save(path)
+
+
+def generate_corpus(directory, copies=2, sizes=SIZES):
+    """Creates `copies` PDFs and PPTXs per size class and returns their paths."""
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for size, count in sizes.items():
+        for copy in range(copies):
+            seed = zlib.crc32(f"{size}-{copy}".encode())
+            pdf_path = os.path.join(directory, f"{size}_{copy}.pdf")
+            pptx_path = os.path.join(directory, f"{size}_{copy}.pptx")
+            if not os.path.exists(pdf_path):
+                write_pdf(pdf_path, count, seed=seed)
+            if not os.path.exists(pptx_path):
+                write_pptx(pptx_path, max(1, count // 5), seed=seed)
+            paths.extend([pdf_path, pptx_path])
+    return paths
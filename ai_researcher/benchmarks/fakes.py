@@ -0,0 +1,111 @@
+"""Local stand-ins for Gemini and Serper so the pipeline can be benchmarked without API keys."""
+import hashlib
+import threading
+import time
+import asyncio
+from aiohttp import web
+
+
+class _FakeChunk:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeGenerativeModel:
+    """Mimics genai.GenerativeModel.generate_content with a fixed first-token latency and a token rate.
+
+    The answer depends only on the prompt, so repeated prompts behave like the real model
+    as far as caching is concerned.
+    """
+
+    def __init__(self, first_token_latency=0.5, tokens_per_second=200, chunk_tokens=20):
+        self.first_token_latency = first_token_latency
+        self.tokens_per_second = tokens_per_second
+        self.chunk_tokens = chunk_tokens
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _answer(self, prompt):
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:8]
+        if "Agent C" in prompt:
+            return "# Academic Audit Report\n\n" + "\n".join(f"- Finding {i} ({digest})" for i in range(60))
+        if "DOCUMENT PART" in prompt:
+            return "SUBJECT HINTS: benchmark course\nTOPICS:\n" + "\n".join(f"- Topic {i} {digest}" for i in range(8))
+        topics = "\n\n".join(
+            f"{i}. Topic {digest} {i}\n   - Explanation: Synthetic topic.\n   - Importance: Benchmark." for i in range(1, 6)
+        )
+        queries = "\n".join(f'{i}. "benchmark {digest} query {i} 2026"' for i in range(1, 4))
+        return f"MAIN SUBJECT:\nBenchmark {digest}\nSynthetic subject.\n\nCORE TOPICS:\n{topics}\n\nSEARCH QUERIES FOR 2026 UPDATES:\n{queries}\n"
+
+    def _chunks(self, text):
+        words = text.split(" ")
+        for i in range(0, len(words), self.chunk_tokens):
+            yield " ".join(words[i:i + self.chunk_tokens]) + " "
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        with self._lock:
+            self.calls += 1
+        text = self._answer(prompt)
+        time.sleep(self.first_token_latency)
+        if not stream:
+            time.sleep(len(text.split(" ")) / self.tokens_per_second)
+            return _FakeChunk(text)
+        return self._stream(text)
+
+    def _stream(self, text):
+        for chunk in self._chunks(text):
+            time.sleep(self.chunk_tokens / self.tokens_per_second)
+            yield _FakeChunk(chunk)
+
+
+class FakeSerperServer:
+    """A local HTTP server answering POST /search like google.serper.dev, in a background thread."""
+
+    def __init__(self, latency=0.2, results_per_query=10, host="127.0.0.1", port=0):
+        self.latency = latency
+        self.results_per_query = results_per_query
+        self.host = host
+        self.port = port
+        self.requests = 0
+        self._loop = asyncio.new_event_loop()
+        self._runner = None
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._serve, name="fake-serper", daemon=True)
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}/search"
+
+    async def _search(self, request):
+        self.requests += 1
+        payload = await request.json()
+        query = payload.get("q", "")
+        await asyncio.sleep(self.latency)
+        organic = [
+            {"title": f"Result {i}", "link": f"https://example.org/{i}", "snippet": f"{query} finding number {i} about 2026 trends."}
+            for i in range(self.results_per_query)
+        ]
+        return web.json_response({"organic": organic})
+
+    def _serve(self):
+        asyncio.set_event_loop(self._loop)
+        app = web.Application()
+        app.router.add_post("/search", self._search)
+        self._runner = web.AppRunner(app)
+        self._loop.run_until_complete(self._runner.setup())
+        site = web.TCPSite(self._runner, self.host, self.port)
+        self._loop.run_until_complete(site.start())
+        self.port = site._server.sockets[0].getsockname()[1]
+        self._ready.set()
+        self._loop.run_forever()
+
+    def start(self):
+        self._thread.start()
+        self._ready.wait(10)
+        return self
+
+    def stop(self):
+        if self._runner is not None:
+            asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result(10)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(10)
@@ -0,0 +1,140 @@
+"""PPTX extraction benchmark: the streaming lxml extractor against the python-pptx object walk.
+
+Builds a large deck with embedded (incompressible) images and speaker notes, then runs
+each extractor in a fresh interpreter and reports wall time, peak RSS growth and the
+number of characters extracted.
+
+Usage (from the ai_researcher directory):
+    python -m benchmarks.pptx_extract --slides 300 --images 8 --image-mb 3 --runs 3
+"""
+import argparse
+import json
+import os
+import statistics
+import struct
+import subprocess
+import sys
+import tempfile
+import zlib
+
+PROBE = """
+import json, os, threading, time
+%s
+
+def rss_kib():
+    with open("/proc/self/statm") as statm:
+        return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+
+# Sample RSS during the extraction only; the import peak would otherwise mask it
+before = peak = rss_kib()
+done = threading.Event()
+def sample():
+    global peak
+    while not done.wait(0.002):
+        peak = max(peak, rss_kib())
+sampler = threading.Thread(target=sample)
+sampler.start()
+start = time.perf_counter()
+with open(%r, "rb") as f:
+    slides = list(extract(f))
+elapsed = time.perf_counter() - start
+done.set()
+sampler.join()
+peak = max(peak, rss_kib())
+print(json.dumps({"seconds": elapsed, "rss_growth_mb": (peak - before) / 1024, "slides": len(slides), "chars": sum(map(len, slides))}))
+"""
+
+EXTRACTORS = {
+    # The extractor parsers.py used before the streaming path
+    "python-pptx": """
+from pptx import Presentation
+def extract(f):
+    prs = Presentation(f)
+    for slide in prs.slides:
+        yield " ".join(shape.text for shape in slide.shapes if hasattr(shape, "text"))
+""",
+    "streaming": """
+from parsers import iter_pptx_slides as extract
+""",
+}
+
+
+def write_noise_png(path, size):
+    """Writes a size x size RGB PNG of random pixels, which compresses to roughly its raw size."""
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    rows = b"".join(b"\x00" + os.urandom(size * 3) for _ in range(size))
+    with open(path, "wb") as f:
+        f.write(b"\x89PNG\r\n\x1a\n")
+        f.write(chunk(b"IHDR", struct.pack(">IIBBBBB", size, size, 8, 2, 0, 0, 0)))
+        f.write(chunk(b"IDAT", zlib.compress(rows, 1)))
+        f.write(chunk(b"IEND", b""))
+
+
+def write_media_deck(path, slides, images, image_mb, work_dir):
+    """A corpus deck with `images` distinct pictures spread across the slides."""
+    from pptx import Presentation
+    from pptx.util import Inches
+    from benchmarks.corpus import write_pptx
+
+    write_pptx(path, slides, seed=slides)
+    side = int((image_mb * 1024 * 1024 / 3) ** 0.5)
+    pictures = []
+    for index in range(images):
+        picture = os.path.join(work_dir, f"noise_{index}.png")
+        write_noise_png(picture, side)
+        pictures.append(picture)
+
+    prs = Presentation(path)
+    for index, slide in enumerate(prs.slides):
+        if pictures and index % max(1, slides // len(pictures)) == 0:
+            slide.shapes.add_picture(pictures[index % len(pictures)], Inches(6), Inches(1), width=Inches(3))
+    prs.save(path)
+
+
+def _sample(extractor, path):
+    env = dict(os.environ, PYTHONWARNINGS="ignore")
+    probe = PROBE % (EXTRACTORS[extractor], path)
+    output = subprocess.run([sys.executable, "-c", probe], capture_output=True, text=True, env=env, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Compare PPTX extractors for time and memory.")
+    arg_parser.add_argument("--slides", type=int, default=300, help="Slides in the generated deck")
+    arg_parser.add_argument("--images", type=int, default=8, help="Distinct embedded images")
+    arg_parser.add_argument("--image-mb", type=float, default=3, help="Approximate size of each image")
+    arg_parser.add_argument("--runs", type=int, default=3, help="Fresh-interpreter samples per extractor")
+    arg_parser.add_argument("--deck", default=None, help="Benchmark this .pptx instead of a generated deck")
+    arg_parser.add_argument("--output", default=None, help="Write the results as JSON to this file")
+    args = arg_parser.parse_args(argv)
+
+    path = args.deck
+    if path is None:
+        work_dir = tempfile.mkdtemp(prefix="pptx-bench-")
+        path = os.path.join(work_dir, "deck.pptx")
+        write_media_deck(path, args.slides, args.images, args.image_mb, work_dir)
+    print(f"Deck: {path} ({os.path.getsize(path) / 1024 / 1024:.1f} MB)")
+
+    results = {"deck_mb": round(os.path.getsize(path) / 1024 / 1024, 1)}
+    for extractor in EXTRACTORS:
+        samples = [_sample(extractor, path) for _ in range(args.runs)]
+        results[extractor] = {
+            "seconds_median": round(statistics.median(s["seconds"] for s in samples), 4),
+            "rss_growth_mb_median": round(statistics.median(s["rss_growth_mb"] for s in samples), 1),
+            "slides": samples[-1]["slides"],
+            "chars": samples[-1]["chars"],
+        }
+        summary = results[extractor]
+        print(f"  {extractor:<12} {summary['seconds_median']:.3f}s  +{summary['rss_growth_mb_median']} MB RSS  "
+              f"{summary['slides']} slides, {summary['chars']} chars")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,243 @@
+"""Offline benchmark for the A -> B -> C pipeline.
+
+Runs a generated corpus through the real agents with a fake Gemini model and a local
+Serper stand-in, under N concurrent simulated users, twice (cold caches, then warm).
+Reports per-stage latency percentiles, throughput, peak RSS (of this process and of the
+PDF extraction workers) and cache hit rates, and
+exits non-zero when a result drifts past the threshold relative to a saved baseline.
+
+Usage (from the ai_researcher directory):
+    python -m benchmarks.run --users 8 --save-baseline benchmarks/baseline.json
+    python -m benchmarks.run --users 8 --baseline benchmarks/baseline.json --threshold 0.25
+"""
+import argparse
+import json
+import os
+import resource
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+STAGES = ("extract", "analyze_ttft", "analyze", "scout", "audit_ttft", "audit")
+
+
+def configure_environment(work_dir):
+    """Points caches at a scratch directory and lifts rate limits; must run before importing the agents."""
+    os.environ["RESPONSE_CACHE_PATH"] = os.path.join(work_dir, "responses.sqlite3")
+    os.environ["GEMINI_REQUESTS_PER_MINUTE"] = "1000000"
+    os.environ["GEMINI_TOKENS_PER_MINUTE"] = "1000000000"
+    os.environ["SERPER_REQUESTS_PER_MINUTE"] = "1000000"
+    os.environ.pop("RATE_LIMIT_STATE_PATH", None)
+
+
+def peak_rss_mb():
+    # This process only; ru_maxrss is in KiB on Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def pdf_worker_peak_rss_mb():
+    """Largest peak RSS of the shared PDF pool's workers, or 0 if the pool never started.
+
+    The workers are forkserver (or spawn) children that are never reaped while the pool
+    lives, so RUSAGE_CHILDREN does not see them; their VmHWM is read from /proc instead.
+    """
+    import parsers
+
+    pool = parsers._pdf_pool
+    if pool is None:
+        return 0.0
+    peak_kib = 0
+    for worker in pool._pool:
+        try:
+            with open(f"/proc/{worker.pid}/status", encoding="ascii") as f:
+                for line in f:
+                    if line.startswith("VmHWM:"):
+                        peak_kib = max(peak_kib, int(line.split()[1]))
+        except OSError:
+            # Not Linux, or the worker has just been replaced
+            continue
+    return round(peak_kib / 1024, 1)
+
+
+class PipelineBenchmark:
+    def __init__(self, parser, scout, auditor, serialize, max_chars):
+        self.parser = parser
+        self.scout = scout
+        self.auditor = auditor
+        self.serialize = serialize
+        self.max_chars = max_chars
+        self._lock = threading.Lock()
+
+    def _record(self, timings, stage, start):
+        with self._lock:
+            timings[stage].append(time.perf_counter() - start)
+
+    def _consume(self, stream, timings, stage):
+        start = time.perf_counter()
+        parts = []
+        for chunk in stream:
+            if not parts:
+                self._record(timings, f"{stage}_ttft", start)
+            parts.append(chunk)
+        self._record(timings, stage, start)
+        return "".join(parts)
+
+    def run_document(self, path, timings):
+        start = time.perf_counter()
+        with open(path, "rb") as f:
+            text_data = self.parser.extract_text(f, char_budget=self.max_chars)
+        self._record(timings, "extract", start)
+
+        report = self._consume(self.parser.analyze_content_stream(text_data), timings, "analyze")
+        queries = self.parser.get_search_queries(report)
+        topics = self.parser.get_core_topics(report)
+
+        start = time.perf_counter()
+        web_data = self.scout.search_2026(queries, topics=topics)
+        self._record(timings, "scout", start)
+
+        web_info, _ = self.serialize(web_data)
+        self._consume(self.auditor.generate_audit_report_stream(report, web_info), timings, "audit")
+
+    def run_pass(self, paths, users):
+        timings = {stage: [] for stage in STAGES}
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=users) as pool:
+            list(pool.map(lambda path: self.run_document(path, timings), paths))
+        elapsed = time.perf_counter() - start
+        return timings, elapsed
+
+
+def summarise(timings, elapsed, documents, percentile):
+    stages = {}
+    for stage, values in timings.items():
+        stages[stage] = {
+            "p50": round(percentile(values, 50), 4),
+            "p95": round(percentile(values, 95), 4),
+            "p99": round(percentile(values, 99), 4),
+        }
+    return {"stages": stages, "elapsed_seconds": round(elapsed, 3), "docs_per_minute": round(documents / elapsed * 60, 2)}
+
+
+def compare(results, baseline, threshold):
+    """Returns a list of human-readable regressions beyond the relative threshold."""
+    regressions = []
+    for pass_name in ("cold", "warm"):
+        current = results[pass_name]
+        previous = baseline.get(pass_name)
+        if not previous:
+            continue
+        for stage, values in current["stages"].items():
+            before = previous["stages"].get(stage, {}).get("p95")
+            # Sub-millisecond stages are too noisy to compare relatively
+            if before and before > 0.001 and values["p95"] > before * (1 + threshold):
+                regressions.append(f"{pass_name} {stage} p95 {values['p95']:.3f}s > baseline {before:.3f}s")
+        before = previous.get("docs_per_minute")
+        if before and current["docs_per_minute"] < before * (1 - threshold):
+            regressions.append(f"{pass_name} throughput {current['docs_per_minute']} < baseline {before} docs/min")
+        for name, stats in current["cache"].items():
+            before = previous.get("cache", {}).get(name, {}).get("hit_rate")
+            if before is not None and stats["hit_rate"] < before - threshold:
+                regressions.append(f"{pass_name} {name} cache hit rate {stats['hit_rate']:.2f} < baseline {before:.2f}")
+    before = baseline.get("peak_rss_mb")
+    if before and results["peak_rss_mb"] > before * (1 + threshold):
+        regressions.append(f"peak RSS {results['peak_rss_mb']} MB > baseline {before} MB")
+    before = baseline.get("pdf_worker_peak_rss_mb")
+    if before and results.get("pdf_worker_peak_rss_mb", 0) > before * (1 + threshold):
+        regressions.append(f"PDF worker peak RSS {results['pdf_worker_peak_rss_mb']} MB > baseline {before} MB")
+    return regressions
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Offline benchmark of the syllabus researcher pipeline.")
+    arg_parser.add_argument("--users", type=int, default=4, help="Concurrent simulated users")
+    arg_parser.add_argument("--copies", type=int, default=2, help="Documents per size class and format")
+    arg_parser.add_argument("--gemini-latency", type=float, default=0.3, help="Fake Gemini first-token latency (s)")
+    arg_parser.add_argument("--gemini-tps", type=float, default=400, help="Fake Gemini output tokens per second")
+    arg_parser.add_argument("--serper-latency", type=float, default=0.15, help="Fake Serper latency (s)")
+    arg_parser.add_argument("--work-dir", default=None, help="Scratch directory for the corpus and caches")
+    arg_parser.add_argument("--output", default=None, help="Write the results as JSON to this file")
+    arg_parser.add_argument("--baseline", default=None, help="Compare against a baseline JSON and fail on drift")
+    arg_parser.add_argument("--save-baseline", default=None, help="Save the results as a new baseline JSON")
+    arg_parser.add_argument("--threshold", type=float, default=0.25, help="Allowed relative drift before failing")
+    args = arg_parser.parse_args(argv)
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="syllabus-bench-")
+    configure_environment(work_dir)
+
+    from benchmarks.corpus import generate_corpus
+    from benchmarks.fakes import FakeGenerativeModel, FakeSerperServer
+    from batch import percentile
+    from cache import get_cache
+    import scout as scout_module
+    from parsers import AgentA_Parser, MAX_ANALYSIS_CHARS
+    from auditor import AgentC_Auditor
+    from research import serialize_research
+
+    paths = generate_corpus(os.path.join(work_dir, "corpus"), copies=args.copies)
+    server = FakeSerperServer(latency=args.serper_latency).start()
+    scout_module.SERPER_SEARCH_URL = server.url
+
+    try:
+        parser = AgentA_Parser("offline-benchmark")
+        auditor = AgentC_Auditor("offline-benchmark")
+        model = FakeGenerativeModel(first_token_latency=args.gemini_latency, tokens_per_second=args.gemini_tps)
+        parser.model = model
+        auditor.model = model
+        scout = scout_module.AgentB_Scout("offline-benchmark")
+
+        bench = PipelineBenchmark(parser, scout, auditor, serialize_research, MAX_ANALYSIS_CHARS)
+
+        results = {"documents": len(paths), "users": args.users}
+        for pass_name in ("cold", "warm"):
+            caches = {name: get_cache(name) for name in ("gemini", "serper")}
+            before = {name: cache.stats() for name, cache in caches.items()}
+            timings, elapsed = bench.run_pass(paths, args.users)
+            summary = summarise(timings, elapsed, len(paths), percentile)
+            summary["cache"] = {}
+            for name, cache in caches.items():
+                after = cache.stats()
+                hits = after["hits"] - before[name]["hits"]
+                misses = after["misses"] - before[name]["misses"]
+                summary["cache"][name] = {"hits": hits, "misses": misses, "hit_rate": round(hits / (hits + misses), 3) if hits + misses else 0.0}
+            results[pass_name] = summary
+        results["peak_rss_mb"] = peak_rss_mb()
+        results["pdf_worker_peak_rss_mb"] = pdf_worker_peak_rss_mb()
+        results["gemini_calls"] = model.calls
+        results["serper_requests"] = server.requests
+    finally:
+        server.stop()
+
+    for pass_name in ("cold", "warm"):
+        summary = results[pass_name]
+        print(f"[{pass_name}] {summary['docs_per_minute']} docs/min over {results['documents']} documents, {args.users} users")
+        for stage, values in summary["stages"].items():
+            print(f"  {stage:<13} p50={values['p50']:.3f}s p95={values['p95']:.3f}s p99={values['p99']:.3f}s")
+        for name, stats in summary["cache"].items():
+            print(f"  cache {name:<7} hit rate {stats['hit_rate']:.2f} ({stats['hits']} hits, {stats['misses']} misses)")
+    print(f"Peak RSS: {results['peak_rss_mb']} MB (PDF workers: {results['pdf_worker_peak_rss_mb']} MB each at most), Gemini calls: {results['gemini_calls']}, Serper requests: {results['serper_requests']}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print("Performance regressions:")
+            for line in regressions:
+                print(f"  - {line}")
+            return 1
+        print("No regressions beyond the threshold.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,87 @@
+"""Cold-start benchmark: import time of the app modules and first-render latency of app.py.
+
+Each sample runs in a fresh interpreter so nothing is already imported. It also reports
+which heavy modules were loaded by the first render; with lazy imports none should be.
+
+Usage (from the ai_researcher directory):
+    python -m benchmarks.startup --runs 5 --max-import-seconds 1.0 --max-render-seconds 4.0
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+HEAVY_MODULES = ("google.generativeai", "pypdf", "pptx", "numpy", "torch", "tensorflow")
+
+IMPORT_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import parsers, scout, auditor, pipeline, research, metrics
+elapsed = time.perf_counter() - start
+print(json.dumps({"seconds": elapsed, "heavy": [m for m in %r if m in sys.modules]}))
+""" % (HEAVY_MODULES,)
+
+RENDER_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+app = AppTest.from_file("app.py", default_timeout=120)
+app.run()
+elapsed = time.perf_counter() - start
+print(json.dumps({"seconds": elapsed, "heavy": [m for m in %r if m in sys.modules], "exceptions": len(app.exception)}))
+""" % (HEAVY_MODULES,)
+
+
+def _sample(probe):
+    env = dict(os.environ)
+    # The first render should get past the API key check without contacting anything
+    env.setdefault("GOOGLE_API_KEY", "startup-benchmark")
+    env.setdefault("SERPER_API_KEY", "startup-benchmark")
+    env["METRICS_PORT"] = "0"
+    env["PYTHONWARNINGS"] = "ignore"
+    output = subprocess.run([sys.executable, "-c", probe], capture_output=True, text=True, env=env, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Measure import time and first-render latency of the app.")
+    arg_parser.add_argument("--runs", type=int, default=5, help="Fresh-interpreter samples per measurement")
+    arg_parser.add_argument("--max-import-seconds", type=float, default=None, help="Fail if the median import time exceeds this")
+    arg_parser.add_argument("--max-render-seconds", type=float, default=None, help="Fail if the median first render exceeds this")
+    arg_parser.add_argument("--output", default=None, help="Write the results as JSON to this file")
+    args = arg_parser.parse_args(argv)
+
+    imports = [_sample(IMPORT_PROBE) for _ in range(args.runs)]
+    renders = [_sample(RENDER_PROBE) for _ in range(args.runs)]
+
+    results = {
+        "import_seconds_median": round(statistics.median(s["seconds"] for s in imports), 4),
+        "render_seconds_median": round(statistics.median(s["seconds"] for s in renders), 4),
+        "heavy_modules_after_import": imports[-1]["heavy"],
+        "heavy_modules_after_render": renders[-1]["heavy"],
+        "render_exceptions": renders[-1]["exceptions"],
+    }
+    print(f"Agent module import: {results['import_seconds_median']:.3f}s (median of {args.runs})")
+    print(f"First render:        {results['render_seconds_median']:.3f}s (median of {args.runs})")
+    print(f"Heavy modules loaded by first render: {', '.join(results['heavy_modules_after_render']) or 'none'}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    failures = []
+    if args.max_import_seconds is not None and results["import_seconds_median"] > args.max_import_seconds:
+        failures.append(f"import time {results['import_seconds_median']:.3f}s > {args.max_import_seconds}s")
+    if args.max_render_seconds is not None and results["render_seconds_median"] > args.max_render_seconds:
+        failures.append(f"first render {results['render_seconds_median']:.3f}s > {args.max_render_seconds}s")
+    if results["render_exceptions"]:
+        failures.append("app.py raised during the first render")
+    for line in failures:
+        print(f"FAIL: {line}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
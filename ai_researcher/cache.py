@@ -0,0 +1,127 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from metrics import record_cache_lookup
+
+# Persistent response cache settings (override with environment variables)
+DEFAULT_CACHE_PATH = os.getenv("RESPONSE_CACHE_PATH", os.path.join(".cache", "responses.sqlite3"))
+DEFAULT_TTL_SECONDS = int(os.getenv("RESPONSE_CACHE_TTL_SECONDS", 7 * 24 * 3600))
+DEFAULT_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", 5000))
+
+
+def make_key(*parts):
+    """Builds a content-addressed cache key from e.g. the model name and the full prompt."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(str(part).encode("utf-8"))
+        digest.update(b"\x1f")
+    return digest.hexdigest()
+
+
+class ResponseCache:
+    """SQLite-backed key/value cache with TTL, LRU size limit and hit/miss counters.
+
+    The database file survives restarts and can be shared by several replicas
+    through a common volume. Values are stored as JSON.
+    """
+
+    def __init__(self, namespace, path=DEFAULT_CACHE_PATH, ttl_seconds=DEFAULT_TTL_SECONDS, max_entries=DEFAULT_MAX_ENTRIES):
+        self.namespace = namespace
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, "
+                "created_at REAL NOT NULL, accessed_at REAL NOT NULL, "
+                "PRIMARY KEY (namespace, key))"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_lru ON entries (namespace, accessed_at)")
+
+    @contextmanager
+    def _connect(self):
+        # A short-lived connection per call keeps the cache safe across threads and processes
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, key):
+        """Returns the cached value, or None on a miss or an expired entry."""
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT value, created_at FROM entries WHERE namespace = ? AND key = ?",
+                (self.namespace, key),
+            ).fetchone()
+            if row is not None and self.ttl_seconds and now - row[1] > self.ttl_seconds:
+                conn.execute("DELETE FROM entries WHERE namespace = ? AND key = ?", (self.namespace, key))
+                row = None
+            if row is not None:
+                conn.execute(
+                    "UPDATE entries SET accessed_at = ? WHERE namespace = ? AND key = ?",
+                    (now, self.namespace, key),
+                )
+
+        record_cache_lookup(self.namespace, row is not None)
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key, value):
+        """Stores a value and evicts the least recently used entries beyond the size limit."""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (namespace, key, value, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (self.namespace, key, json.dumps(value), now, now),
+            )
+            if self.max_entries:
+                conn.execute(
+                    "DELETE FROM entries WHERE namespace = ? AND key IN ("
+                    "SELECT key FROM entries WHERE namespace = ? ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                    (self.namespace, self.namespace, self.max_entries),
+                )
+
+    def stats(self):
+        """Returns hit/miss counters for this process and the number of stored entries."""
+        with self._connect() as conn:
+            entries = conn.execute("SELECT COUNT(*) FROM entries WHERE namespace = ?", (self.namespace,)).fetchone()[0]
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": entries,
+            }
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(namespace, ttl_seconds=DEFAULT_TTL_SECONDS):
+    """Returns the process-wide cache for a namespace, creating it on first use."""
+    with _caches_lock:
+        if namespace not in _caches:
+            _caches[namespace] = ResponseCache(namespace, ttl_seconds=ttl_seconds)
+        return _caches[namespace]
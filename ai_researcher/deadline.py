@@ -0,0 +1,102 @@
+"""End-to-end deadline budgets for the A -> B -> C pipeline.
+
+The caller opens one deadline_scope for a run; every stage below it reads the remaining
+budget from current_deadline instead of using its own fixed timeouts, and stops retrying
+once a backoff would outlive the budget. Work cut short is recorded on the Deadline, so
+callers can label the results as partial.
+"""
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Default budget of one interactive step in the app (and of one batch document when enabled)
+PIPELINE_DEADLINE_SECONDS = float(os.getenv("PIPELINE_DEADLINE_SECONDS", 90))
+
+PARTIAL_NOTICE = "_[Partial result: the time budget ran out before this was complete.]_"
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+class Deadline:
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+        self.partial_stages = []
+        self._lock = threading.Lock()
+
+    def remaining(self):
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self):
+        return self.remaining() <= 0
+
+    def timeout(self, cap=None):
+        """The remaining budget, capped by a stage's own timeout."""
+        remaining = self.remaining()
+        return remaining if cap is None else min(cap, remaining)
+
+    def check(self, stage):
+        if self.expired():
+            raise DeadlineExceeded(f"{stage} did not start: the {self.seconds:g}s time budget is used up.")
+
+    def mark_partial(self, stage):
+        with self._lock:
+            if stage not in self.partial_stages:
+                self.partial_stages.append(stage)
+
+    @property
+    def partial(self):
+        return bool(self.partial_stages)
+
+
+current_deadline = ContextVar("current_deadline", default=None)
+
+
+@contextmanager
+def deadline_scope(budget):
+    """Runs the block under a deadline: a Deadline object, or a budget in seconds (None for no deadline)."""
+    deadline = budget if isinstance(budget, Deadline) or budget is None else Deadline(budget)
+    token = current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        current_deadline.reset(token)
+
+
+def remaining_timeout(cap=None):
+    """The current deadline's remaining budget capped at `cap`, or just `cap` without a deadline."""
+    deadline = current_deadline.get()
+    return cap if deadline is None else deadline.timeout(cap)
+
+
+def check_deadline(stage):
+    deadline = current_deadline.get()
+    if deadline is not None:
+        deadline.check(stage)
+
+
+def mark_partial(stage):
+    deadline = current_deadline.get()
+    if deadline is not None:
+        deadline.mark_partial(stage)
+
+
+def stop_before_deadline(retry_state):
+    """tenacity stop condition: give up when the next backoff would sleep past the deadline."""
+    deadline = current_deadline.get()
+    return deadline is not None and deadline.remaining() <= (retry_state.upcoming_sleep or 0)
+
+
+def propagate(fn):
+    """Wraps fn so that, called from another thread, it sees the caller's deadline and run id."""
+    context = contextvars.copy_context()
+
+    def wrapper(*args, **kwargs):
+        # A context can only be entered by one thread at a time
+        return context.copy().run(fn, *args, **kwargs)
+    return wrapper
@@ -0,0 +1,184 @@
+"""Near-duplicate syllabus detection with MinHash and LSH banding.
+
+Syllabi re-uploaded across semesters differ only in dates or instructor names, so an
+exact-text cache misses them. Each analysed document's extracted text is reduced to a
+MinHash signature, whose bands are stored as SQLite buckets. A lookup only compares the
+signatures that share at least one bucket, which keeps queries fast with tens of
+thousands of stored documents. Documents are scoped by a hash of the uploader's API key
+(owner_id), so nobody is offered another key's reports.
+"""
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from cache import make_key
+
+SYLLABUS_INDEX_PATH = os.getenv("SYLLABUS_INDEX_PATH", os.path.join(".cache", "syllabi.sqlite3"))
+# Estimated Jaccard similarity above which a previous Agent A report is offered for reuse.
+# With word bigrams, changing 5% of the words still leaves ~0.82; unrelated syllabi score near 0
+SIMILARITY_THRESHOLD = float(os.getenv("SYLLABUS_SIMILARITY_THRESHOLD", 0.75))
+
+# Each changed word breaks up to SHINGLE_WORDS shingles, so short shingles tolerate small edits
+SHINGLE_WORDS = 2
+NUM_PERMUTATIONS = 144
+# 24 bands of 6 rows: a pair at 0.75 similarity shares a bucket with probability ~0.99
+# (1 - (1 - 0.75**6)**24), a pair at 0.5 with ~0.31 and one at 0.3 with ~0.02
+LSH_BANDS = 24
+# Bump when the schema, shingling or hashing changes; older signatures are not comparable
+INDEX_VERSION = 3
+# A prime just above 2**32, so (a * x + b) never overflows uint64 for 32-bit a, b and x
+HASH_PRIME = 4294967311
+SHINGLE_BLOCK = 8192
+
+
+def _shingle_hashes(text, size=SHINGLE_WORDS):
+    import numpy as np
+
+    words = re.findall(r"\w+", text.lower())
+    if len(words) < size:
+        shingles = {" ".join(words)}
+    else:
+        shingles = {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+    return np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles))
+
+
+def owner_id(api_key):
+    """Opaque index scope for an API key: documents are only matched against the same key's uploads."""
+    return hashlib.sha256(f"syllabus-index:{api_key}".encode("utf-8")).hexdigest()[:32]
+
+
+class SyllabusIndex:
+    def __init__(self, path=SYLLABUS_INDEX_PATH, threshold=SIMILARITY_THRESHOLD, num_permutations=NUM_PERMUTATIONS, bands=LSH_BANDS):
+        import numpy as np
+
+        if num_permutations % bands:
+            raise ValueError("num_permutations must be a multiple of bands.")
+        self.path = path
+        self.threshold = threshold
+        self.num_permutations = num_permutations
+        self.bands = bands
+        # Fixed seed: signatures must stay comparable across processes and restarts
+        rng = np.random.default_rng(20260101)
+        self._a = rng.integers(1, 2 ** 32, size=num_permutations, dtype=np.uint64)
+        self._b = rng.integers(0, 2 ** 32, size=num_permutations, dtype=np.uint64)
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            if conn.execute("PRAGMA user_version").fetchone()[0] != INDEX_VERSION:
+                # The index only saves Agent A calls, so an outdated one is simply rebuilt
+                conn.execute("DROP TABLE IF EXISTS documents")
+                conn.execute("DROP TABLE IF EXISTS bands")
+                conn.execute(f"PRAGMA user_version = {INDEX_VERSION}")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS documents ("
+                "id INTEGER PRIMARY KEY, owner TEXT NOT NULL, text_key TEXT NOT NULL, name TEXT, signature BLOB NOT NULL, "
+                "report TEXT NOT NULL, queries TEXT NOT NULL, topics TEXT NOT NULL, created_at REAL NOT NULL, UNIQUE (owner, text_key))"
+            )
+            conn.execute("CREATE TABLE IF NOT EXISTS bands (owner TEXT NOT NULL, band INTEGER NOT NULL, bucket INTEGER NOT NULL, document_id INTEGER NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS bands_lookup ON bands (owner, band, bucket)")
+            conn.execute("CREATE INDEX IF NOT EXISTS bands_document ON bands (document_id)")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def signature(self, text):
+        """MinHash signature of the text's word shingles, as a uint64 array of num_permutations values."""
+        import numpy as np
+
+        hashes = _shingle_hashes(text)
+        signature = np.full(self.num_permutations, HASH_PRIME, dtype=np.uint64)
+        # Blocks bound the (shingles x permutations) matrix for 400k-character documents
+        for start in range(0, len(hashes), SHINGLE_BLOCK):
+            block = hashes[start:start + SHINGLE_BLOCK, None]
+            permuted = (block * self._a + self._b) % HASH_PRIME
+            np.minimum(signature, permuted.min(axis=0), out=signature)
+        return signature
+
+    def _buckets(self, signature):
+        rows = self.num_permutations // self.bands
+        for band in range(self.bands):
+            digest = hashlib.blake2b(signature[band * rows:(band + 1) * rows].tobytes(), digest_size=8).digest()
+            yield band, int.from_bytes(digest, "big", signed=True)
+
+    def find(self, text, owner):
+        """Returns the owner's most similar stored document at or above the threshold, or None."""
+        import numpy as np
+
+        signature = self.signature(text)
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM documents WHERE owner = ? AND text_key = ?", (owner, make_key(text))).fetchone()
+            if row is not None:
+                return self._match(row, 1.0)
+
+            candidates = set()
+            for band, bucket in self._buckets(signature):
+                candidates.update(
+                    document_id for (document_id,) in conn.execute(
+                        "SELECT document_id FROM bands WHERE owner = ? AND band = ? AND bucket = ?", (owner, band, bucket)
+                    )
+                )
+            best, best_similarity = None, self.threshold
+            for document_id in candidates:
+                row = conn.execute("SELECT * FROM documents WHERE id = ?", (document_id,)).fetchone()
+                # The fraction of equal MinHash values estimates the Jaccard similarity
+                similarity = float(np.mean(np.frombuffer(row[4], dtype=np.uint64) == signature))
+                if similarity >= best_similarity:
+                    best, best_similarity = row, similarity
+        return self._match(best, best_similarity) if best is not None else None
+
+    @staticmethod
+    def _match(row, similarity):
+        _, _, _, name, _, report, queries, topics, created_at = row
+        return {
+            "similarity": similarity,
+            "name": name,
+            "report": report,
+            "queries": json.loads(queries),
+            "topics": json.loads(topics),
+            "created_at": created_at,
+        }
+
+    def add(self, text, report, queries, topics, owner, name=None):
+        """Stores Agent A's results for this text under an owner; re-adding the same text replaces them."""
+        signature = self.signature(text)
+        with self._connect() as conn:
+            text_key = make_key(text)
+            conn.execute(
+                "INSERT INTO documents (owner, text_key, name, signature, report, queries, topics, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(owner, text_key) DO UPDATE SET name = excluded.name, report = excluded.report, "
+                "queries = excluded.queries, topics = excluded.topics, created_at = excluded.created_at",
+                (owner, text_key, name, signature.tobytes(), report, json.dumps(queries), json.dumps(topics), time.time()),
+            )
+            document_id = conn.execute("SELECT id FROM documents WHERE owner = ? AND text_key = ?", (owner, text_key)).fetchone()[0]
+            conn.execute("DELETE FROM bands WHERE document_id = ?", (document_id,))
+            conn.executemany(
+                "INSERT INTO bands (owner, band, bucket, document_id) VALUES (?, ?, ?, ?)",
+                [(owner, band, bucket, document_id) for band, bucket in self._buckets(signature)],
+            )
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_syllabus_index():
+    """Returns the process-wide syllabus index."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = SyllabusIndex()
+        return _index
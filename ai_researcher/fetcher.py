@@ -0,0 +1,180 @@
+"""Optional deep-research stage: fetches search result pages and distils them to passages.
+
+Pages are fetched concurrently on the scout runtime's shared session, with a global and
+a per-host concurrency limit, streamed reads capped at MAX_PAGE_BYTES and only text
+content types accepted. The distilled text is cached by URL and revalidated with the
+page's ETag, so repeated audits mostly cost a 304 or nothing at all.
+"""
+import asyncio
+import os
+import re
+import time
+from urllib.parse import urljoin, urlsplit
+import aiohttp
+from cache import get_cache, make_key
+from deadline import DeadlineExceeded, check_deadline, remaining_timeout
+from metrics import instrument
+from runtime import is_public_address
+
+FETCH_CONCURRENCY = int(os.getenv("DEEP_FETCH_CONCURRENCY", 8))
+FETCH_PER_HOST = int(os.getenv("DEEP_FETCH_PER_HOST", 2))
+FETCH_TIMEOUT_SECONDS = 8
+MAX_REDIRECTS = 5
+REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+MAX_PAGE_BYTES = int(os.getenv("DEEP_MAX_PAGE_BYTES", 1024 * 1024))
+ACCEPTED_CONTENT_TYPES = ("text/html", "application/xhtml+xml", "text/plain")
+USER_AGENT = "UniversalSyllabusResearcher/1.0 (+deep research)"
+
+# Cached pages are reused without a request for this long, then revalidated with their ETag
+PAGE_FRESH_SECONDS = int(os.getenv("DEEP_PAGE_FRESH_SECONDS", 24 * 3600))
+PAGE_CACHE_TTL_SECONDS = 14 * 24 * 3600
+
+# Distillation: paragraphs shorter than this or mostly made of links are page chrome
+MIN_PARAGRAPH_CHARS = 60
+MAX_LINK_DENSITY = 0.5
+PASSAGE_WORDS = 120
+BOILERPLATE_TAGS = ("script", "style", "noscript", "nav", "header", "footer", "aside", "form", "svg", "iframe", "button", "template")
+BLOCK_TAGS = ("p", "li", "h1", "h2", "h3", "h4", "blockquote", "pre", "td", "dd")
+
+
+def distill_html(html_bytes, encoding=None):
+    """Extracts the main-text paragraphs of an HTML page, dropping navigation, scripts and link lists."""
+    import lxml.html
+    from lxml import etree
+
+    parser = lxml.html.HTMLParser(encoding=encoding, remove_comments=True, no_network=True)
+    try:
+        root = lxml.html.document_fromstring(html_bytes, parser=parser)
+    except (etree.ParserError, ValueError):
+        return []
+    etree.strip_elements(root, *BOILERPLATE_TAGS, with_tail=False)
+
+    paragraphs = []
+    for element in root.iter(*BLOCK_TAGS):
+        # Nested blocks (a <p> inside an <li>) are counted once, at the innermost level
+        if any(child.tag in BLOCK_TAGS for child in element.iterdescendants()):
+            continue
+        text = re.sub(r"\s+", " ", element.text_content()).strip()
+        if len(text) < MIN_PARAGRAPH_CHARS:
+            continue
+        link_chars = sum(len(link.text_content()) for link in element.iter("a"))
+        if link_chars / len(text) > MAX_LINK_DENSITY:
+            continue
+        paragraphs.append(text)
+    return paragraphs
+
+
+def distill_text(text):
+    paragraphs = (re.sub(r"\s+", " ", block).strip() for block in re.split(r"\n\s*\n", text))
+    return [p for p in paragraphs if len(p) >= MIN_PARAGRAPH_CHARS]
+
+
+def split_passages(paragraphs, words=PASSAGE_WORDS):
+    """Groups consecutive paragraphs into passages of about `words` words."""
+    passages = []
+    current = []
+    count = 0
+    for paragraph in paragraphs:
+        current.append(paragraph)
+        count += len(paragraph.split())
+        if count >= words:
+            passages.append(" ".join(current))
+            current, count = [], 0
+    if current:
+        passages.append(" ".join(current))
+    return passages
+
+
+class PageFetcher:
+    def __init__(self, concurrency=FETCH_CONCURRENCY, per_host=FETCH_PER_HOST, max_bytes=MAX_PAGE_BYTES):
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.max_bytes = max_bytes
+        self.cache = get_cache("pages", ttl_seconds=PAGE_CACHE_TTL_SECONDS)
+
+    async def _read_capped(self, response):
+        body = bytearray()
+        async for chunk in response.content.iter_chunked(64 * 1024):
+            body += chunk
+            if len(body) >= self.max_bytes:
+                # Enough for the main text; the rest of a huge page is not worth downloading
+                break
+        return bytes(body[:self.max_bytes])
+
+    async def _get_public(self, session, url, headers, timeout):
+        """GETs the URL, following redirects by hand so every hop is checked.
+
+        The session's resolver (see runtime.PublicResolver) refuses host names with a
+        non-public address; IP literals never reach a resolver and are checked here.
+        """
+        for _ in range(MAX_REDIRECTS + 1):
+            parts = urlsplit(url)
+            if parts.scheme not in ("http", "https") or not parts.hostname:
+                raise aiohttp.InvalidURL(url, "not an http(s) URL")
+            try:
+                public = is_public_address(parts.hostname)
+            except ValueError:
+                # A host name; the resolver checks it
+                public = True
+            if not public:
+                raise aiohttp.InvalidURL(url, "non-public address")
+            response = await session.get(url, headers=headers, timeout=timeout, allow_redirects=False)
+            location = response.headers.get("Location")
+            if response.status not in REDIRECT_STATUSES or not location:
+                return response
+            response.release()
+            url = urljoin(str(response.url), location)
+        raise aiohttp.TooManyRedirects(response.request_info, response.history)
+
+    @instrument("fetch_page")
+    async def fetch_page_async(self, session, url):
+        """Returns the distilled paragraphs of one page, or [] if it cannot be used.
+
+        The session must only connect to public addresses, like ScoutRuntime.get_page_session().
+        """
+        key = make_key(url)
+        # The SQLite cache can block on a locked file, so it is never touched on the shared event loop
+        cached = await asyncio.to_thread(self.cache.get, key)
+        if cached is not None and time.time() - cached["fetched_at"] < PAGE_FRESH_SECONDS:
+            return cached["paragraphs"]
+
+        check_deadline("fetch_page")
+        headers = {"User-Agent": USER_AGENT, "Accept": ", ".join(ACCEPTED_CONTENT_TYPES)}
+        if cached is not None and cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+
+        timeout = aiohttp.ClientTimeout(total=remaining_timeout(FETCH_TIMEOUT_SECONDS))
+        async with await self._get_public(session, url, headers, timeout) as response:
+            if response.status == 304 and cached is not None:
+                cached["fetched_at"] = time.time()
+                await asyncio.to_thread(self.cache.set, key, cached)
+                return cached["paragraphs"]
+            if response.status != 200 or response.content_type not in ACCEPTED_CONTENT_TYPES:
+                return []
+            body = await self._read_capped(response)
+            if response.content_type == "text/plain":
+                paragraphs = distill_text(body.decode(response.charset or "utf-8", errors="replace"))
+            else:
+                paragraphs = distill_html(body, response.charset)
+            etag = response.headers.get("ETag")
+
+        await asyncio.to_thread(self.cache.set, key, {"etag": etag, "fetched_at": time.time(), "paragraphs": paragraphs})
+        return paragraphs
+
+    async def fetch_pages_async(self, session, urls):
+        """Fetches the pages concurrently and returns {url: paragraphs}; failed pages are left out."""
+        urls = [url for url in dict.fromkeys(urls) if urlsplit(url).scheme in ("http", "https")]
+        overall = asyncio.Semaphore(self.concurrency)
+        per_host = {}
+
+        async def fetch(url):
+            host = per_host.setdefault(urlsplit(url).hostname, asyncio.Semaphore(self.per_host))
+            async with host, overall:
+                try:
+                    return url, await self.fetch_page_async(session, url)
+                except (aiohttp.ClientError, asyncio.TimeoutError, UnicodeDecodeError, DeadlineExceeded):
+                    # Deep research is best effort; the snippets are still there
+                    return url, []
+
+        results = await asyncio.gather(*[fetch(url) for url in urls])
+        return {url: paragraphs for url, paragraphs in results if paragraphs}
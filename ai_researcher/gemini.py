@@ -0,0 +1,168 @@
+import os
+import threading
+from google.api_core.exceptions import GoogleAPIError, ResourceExhausted
+from tenacity import retry, wait_exponential, stop_after_attempt, retry_if_exception_type
+from cache import get_cache, make_key
+from ratelimit import get_limiter, parse_retry_after
+from metrics import count_retry, record_tokens
+from deadline import DeadlineExceeded, PARTIAL_NOTICE, current_deadline, check_deadline, mark_partial, remaining_timeout, stop_before_deadline
+
+CHARS_PER_TOKEN = 4
+# Longest a single Gemini request may take; a pipeline deadline can shorten it further
+GEMINI_TIMEOUT_SECONDS = float(os.getenv("GEMINI_TIMEOUT_SECONDS", 60))
+
+
+def estimate_tokens(text):
+    """Cheap token estimate, good enough for budgeting prompts."""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+_configured_key = None
+_configure_lock = threading.Lock()
+
+
+def _make_model(api_key, model_name):
+    """Imports the Gemini SDK on first use and builds a model bound to this API key.
+
+    genai.configure is process-global, so it is only called when the key changes, and the
+    model is bound to the client for its key right away; later configure calls for other
+    keys then no longer affect it.
+    """
+    global _configured_key
+    import google.generativeai as genai
+    from google.generativeai import client
+
+    with _configure_lock:
+        if api_key != _configured_key:
+            genai.configure(api_key=api_key)
+            _configured_key = api_key
+        model = genai.GenerativeModel(model_name)
+        model._client = client.get_default_generative_client()
+    return model
+
+
+def _retry_after(error):
+    # Only REST transport errors carry the HTTP response and its headers
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    return parse_retry_after(headers.get("Retry-After"))
+
+
+class GeminiAgent:
+    """Shared Gemini plumbing for Agent A and Agent C: retries, persistent caching and streaming."""
+
+    model_name = 'gemini-3-flash-preview'
+    # Stage name used to label partial results
+    stage = 'gemini'
+
+    def __init__(self, api_key: str):
+        if not api_key:
+            raise ValueError("Google API Key is required.")
+        self.model = _make_model(api_key, self.model_name)
+        self.cache = get_cache("gemini")
+        self.limiter = get_limiter("gemini")
+
+    def _request_options(self):
+        check_deadline(self.stage)
+        return {"timeout": remaining_timeout(GEMINI_TIMEOUT_SECONDS)}
+
+    def _raise_if_past_deadline(self, error):
+        deadline = current_deadline.get()
+        if deadline is not None and deadline.expired():
+            raise DeadlineExceeded(f"{self.stage} ran out of its {deadline.seconds:g}s time budget.") from error
+
+    @retry(stop=stop_after_attempt(3) | stop_before_deadline, wait=wait_exponential(multiplier=2, min=4, max=15), retry=retry_if_exception_type(GoogleAPIError), before_sleep=count_retry("gemini"))
+    def _call_model(self, prompt):
+        self.limiter.acquire(tokens=estimate_tokens(prompt))
+        try:
+            response = self.model.generate_content(prompt, request_options=self._request_options())
+        except ResourceExhausted as e:
+            self.limiter.on_throttle(_retry_after(e))
+            raise
+        except GoogleAPIError as e:
+            self._raise_if_past_deadline(e)
+            raise
+        self.limiter.on_success()
+        text = response.text
+        self._record_usage(getattr(response, "usage_metadata", None), prompt, text)
+        return text
+
+    @retry(stop=stop_after_attempt(3) | stop_before_deadline, wait=wait_exponential(multiplier=2, min=4, max=15), retry=retry_if_exception_type(GoogleAPIError), before_sleep=count_retry("gemini"))
+    def _open_stream(self, prompt):
+        # Only opening the stream is retried; a stream that fails midway is not replayed
+        self.limiter.acquire(tokens=estimate_tokens(prompt))
+        try:
+            response = self.model.generate_content(prompt, stream=True, request_options=self._request_options())
+        except ResourceExhausted as e:
+            self.limiter.on_throttle(_retry_after(e))
+            raise
+        except GoogleAPIError as e:
+            self._raise_if_past_deadline(e)
+            raise
+        self.limiter.on_success()
+        return response
+
+    def _generate(self, prompt):
+        """Returns the model's answer to a prompt, served from the persistent cache when possible."""
+        cache_key = make_key(self.model_name, prompt)
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        text = self._call_model(prompt)
+        self.cache.set(cache_key, text)
+        return text
+
+    def _generate_stream(self, prompt):
+        """Yields the answer in chunks as it is generated and caches the assembled text once complete."""
+        cache_key = make_key(self.model_name, prompt)
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            yield cached
+            return
+
+        parts = []
+        usage = None
+        deadline = current_deadline.get()
+        truncated = False
+        no_text_error = None
+        try:
+            for chunk in self._open_stream(prompt):
+                # Usage metadata arrives with the last chunk(s)
+                usage = getattr(chunk, "usage_metadata", None) or usage
+                try:
+                    text = chunk.text
+                except ValueError as e:
+                    # Chunks without text parts (e.g. a trailing finish reason) carry nothing to show
+                    no_text_error = e
+                    continue
+                parts.append(text)
+                yield text
+                if deadline is not None and deadline.expired():
+                    truncated = True
+                    break
+        except GoogleAPIError as e:
+            if not parts:
+                self._raise_if_past_deadline(e)
+            if deadline is None or not deadline.expired():
+                raise
+            truncated = True
+
+        if truncated:
+            # Keep what arrived in time, labelled as partial and never cached
+            mark_partial(self.stage)
+            yield f"\n\n{PARTIAL_NOTICE}"
+            return
+
+        if not parts:
+            # Like response.text for a blocked prompt; an empty answer must not be cached
+            raise no_text_error or ValueError("The model returned no text for this prompt.")
+        full_text = "".join(parts)
+        self._record_usage(usage, prompt, full_text)
+        self.cache.set(cache_key, full_text)
+
+    def _record_usage(self, usage, prompt, text):
+        # Fall back to estimates when the response carries no usage metadata
+        prompt_tokens = getattr(usage, "prompt_token_count", None) or estimate_tokens(prompt)
+        response_tokens = getattr(usage, "candidates_token_count", None) or estimate_tokens(text)
+        record_tokens(prompt_tokens, response_tokens)
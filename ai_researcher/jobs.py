@@ -0,0 +1,308 @@
+"""Durable background jobs for the A -> B -> C pipeline.
+
+Jobs live in a SQLite queue, so several app replicas can share one pool of worker
+processes and a browser refresh can reattach to a job that is still running. Job ids
+are derived from the job's inputs: submitting the same work twice returns the existing
+job instead of paying for it again.
+
+Run standalone workers with:
+    python jobs.py worker --processes 2
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from cache import make_key
+from dedup import get_syllabus_index, owner_id
+from deadline import current_deadline, deadline_scope
+
+JOB_QUEUE_PATH = os.getenv("JOB_QUEUE_PATH", os.path.join(".cache", "jobs.sqlite3"))
+# Local worker processes started by the app; set to 0 when dedicated workers run elsewhere
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 2))
+# A running job whose worker has not sent a heartbeat for this long is handed to another worker
+JOB_LEASE_SECONDS = 60
+JOB_MAX_ATTEMPTS = 3
+POLL_INTERVAL_SECONDS = 0.5
+# Finished and failed jobs (and their reports) are deleted after this long
+JOB_RETENTION_SECONDS = int(os.getenv("JOB_RETENTION_SECONDS", 24 * 3600))
+PURGE_INTERVAL_SECONDS = 300
+# Worker process i serves its Prometheus metrics on JOB_METRICS_PORT + i; 0 disables them
+JOB_METRICS_PORT = int(os.getenv("JOB_METRICS_PORT", 9110))
+
+
+class JobQueue:
+    def __init__(self, path=JOB_QUEUE_PATH):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, kind TEXT NOT NULL, status TEXT NOT NULL, "
+                "stage TEXT, progress REAL NOT NULL DEFAULT 0, payload TEXT NOT NULL, "
+                # API keys are kept apart from the payload and wiped once the job ends
+                "secrets TEXT, result TEXT, error TEXT, worker TEXT, attempts INTEGER NOT NULL DEFAULT 0, "
+                "created_at REAL NOT NULL, updated_at REAL NOT NULL, heartbeat_at REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_updated ON jobs (status, updated_at)")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def submit(self, kind, payload, secrets):
+        """Queues a job and returns its id; identical work already queued, running or fully done is reused."""
+        job_id = make_key(kind, json.dumps(payload, sort_keys=True))
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT status, result FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                conn.execute(
+                    "INSERT INTO jobs (id, kind, status, payload, secrets, created_at, updated_at) VALUES (?, ?, 'queued', ?, ?, ?, ?)",
+                    (job_id, kind, json.dumps(payload), json.dumps(secrets), now, now),
+                )
+            elif row["status"] == "failed" or (row["status"] == "done" and json.loads(row["result"]).get("partial_stages")):
+                # The payload was cleared when the job finished; a result cut short by its deadline is not reused
+                conn.execute(
+                    "UPDATE jobs SET status = 'queued', stage = NULL, progress = 0, result = NULL, error = NULL, attempts = 0, "
+                    "payload = ?, secrets = ?, updated_at = ? WHERE id = ?",
+                    (json.dumps(payload), json.dumps(secrets), now, job_id),
+                )
+            conn.execute("COMMIT")
+        return job_id
+
+    def get(self, job_id):
+        """Returns the job's public state (never its secrets), or None if it does not exist."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT id, kind, status, stage, progress, result, error, attempts, created_at, updated_at FROM jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def claim(self, worker):
+        """Atomically takes the oldest queued (or abandoned) job for this worker."""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE status = 'queued' OR (status = 'running' AND heartbeat_at < ?) "
+                "ORDER BY created_at LIMIT 1",
+                (now - JOB_LEASE_SECONDS,),
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            if row["attempts"] >= JOB_MAX_ATTEMPTS:
+                conn.execute(
+                    "UPDATE jobs SET status = 'failed', error = 'Worker died too many times', payload = '{}', secrets = NULL, "
+                    "updated_at = ? WHERE id = ?",
+                    (now, row["id"]),
+                )
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'running', worker = ?, attempts = attempts + 1, heartbeat_at = ?, updated_at = ? WHERE id = ?",
+                (worker, now, now, row["id"]),
+            )
+            conn.execute("COMMIT")
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        job["secrets"] = json.loads(job["secrets"] or "{}")
+        return job
+
+    def heartbeat(self, job_id, stage=None, progress=None):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET heartbeat_at = ?, updated_at = ?, stage = COALESCE(?, stage), progress = COALESCE(?, progress) "
+                "WHERE id = ? AND status = 'running'",
+                (now, now, stage, progress, job_id),
+            )
+
+    def complete(self, job_id, result):
+        with self._connect() as conn:
+            conn.execute(
+                # The payload holds the document text, which is not needed once the result is in
+                "UPDATE jobs SET status = 'done', progress = 1, stage = NULL, result = ?, payload = '{}', secrets = NULL, "
+                "updated_at = ? WHERE id = ?",
+                (json.dumps(result), time.time(), job_id),
+            )
+
+    def fail(self, job_id, error):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'failed', error = ?, payload = '{}', secrets = NULL, updated_at = ? WHERE id = ?",
+                (error, time.time(), job_id),
+            )
+
+    def purge(self, retention_seconds=JOB_RETENTION_SECONDS):
+        """Deletes jobs that finished or failed more than retention_seconds ago; returns how many."""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "DELETE FROM jobs WHERE status IN ('done', 'failed') AND updated_at < ?",
+                (time.time() - retention_seconds,),
+            )
+            return cursor.rowcount
+
+
+def _run_analyze(agents, payload, secrets, progress):
+    parser = agents.parser(secrets["google_api_key"])
+    progress("Agent A is analysing the document", 0.1)
+    report = parser.analyze_content(payload["text"])
+    progress("Agent A is drafting search queries", 0.9)
+    result = {
+        "report": report,
+        "queries": parser.get_search_queries(report),
+        "topics": parser.get_core_topics(report),
+    }
+    deadline = current_deadline.get()
+    if deadline is not None and deadline.partial:
+        # A report cut short by the deadline is not worth reusing
+        return result
+    get_syllabus_index().add(payload["text"], result["report"], result["queries"], result["topics"], owner_id(secrets["google_api_key"]), name=payload.get("name"))
+    return result
+
+
+def _run_scout(agents, payload, secrets, progress):
+    scout = agents.scout(secrets["serper_api_key"])
+    progress("Agent B is searching the live web", 0.1)
+    result = {"web_data": scout.search_2026(payload["queries"], topics=payload.get("topics"))}
+    if payload.get("deep"):
+        progress("Agent B is reading the top result pages", 0.6)
+        result["passages"] = scout.deep_research(payload["queries"], topics=payload.get("topics"))
+    return result
+
+
+def _run_audit(agents, payload, secrets, progress):
+    auditor = agents.auditor(secrets["google_api_key"])
+    progress("Agent C is auditing the curriculum gap", 0.1)
+    return {"final_report": auditor.generate_audit_report(payload["report"], payload["web_info"], sharded=payload.get("sharded"))}
+
+
+HANDLERS = {"analyze": _run_analyze, "scout": _run_scout, "audit": _run_audit}
+
+
+class _AgentPool:
+    """Agent clients of one worker process, one per API key."""
+
+    def __init__(self):
+        self._agents = {}
+
+    def _get(self, cls, api_key):
+        key = (cls.__name__, api_key)
+        if key not in self._agents:
+            self._agents[key] = cls(api_key)
+        return self._agents[key]
+
+    def parser(self, api_key):
+        from parsers import AgentA_Parser
+        return self._get(AgentA_Parser, api_key)
+
+    def scout(self, api_key):
+        from scout import AgentB_Scout
+        return self._get(AgentB_Scout, api_key)
+
+    def auditor(self, api_key):
+        from auditor import AgentC_Auditor
+        return self._get(AgentC_Auditor, api_key)
+
+
+def worker_loop(path=JOB_QUEUE_PATH, stop_event=None, metrics_port=0):
+    """Claims and runs jobs until stop_event is set (forever by default)."""
+    from metrics import start_metrics_server
+
+    # The agents' stage metrics are recorded here, not in the app process
+    start_metrics_server(metrics_port)
+    queue = JobQueue(path)
+    agents = _AgentPool()
+    worker = f"{socket.gethostname()}:{os.getpid()}"
+    last_purge = 0
+
+    while stop_event is None or not stop_event.is_set():
+        if time.time() - last_purge > PURGE_INTERVAL_SECONDS:
+            queue.purge()
+            last_purge = time.time()
+        job = queue.claim(worker)
+        if job is None:
+            time.sleep(POLL_INTERVAL_SECONDS)
+            continue
+
+        done = threading.Event()
+
+        def beat():
+            # Keeps the lease alive while a long Gemini call is in progress
+            while not done.wait(JOB_LEASE_SECONDS / 4):
+                queue.heartbeat(job["id"])
+
+        threading.Thread(target=beat, daemon=True).start()
+        try:
+            # The budget counts from when a worker picks the job up, not from when it was queued
+            with deadline_scope(job["payload"].get("deadline_seconds")) as deadline:
+                result = HANDLERS[job["kind"]](
+                    agents,
+                    job["payload"],
+                    job["secrets"],
+                    lambda stage, progress: queue.heartbeat(job["id"], stage, progress),
+                )
+            if deadline is not None and deadline.partial:
+                result["partial_stages"] = deadline.partial_stages
+            queue.complete(job["id"], result)
+        except Exception as e:
+            queue.fail(job["id"], str(e))
+        finally:
+            done.set()
+
+
+def start_local_workers(processes=JOB_WORKERS, path=JOB_QUEUE_PATH, metrics_port=JOB_METRICS_PORT):
+    """Starts daemon worker processes next to the app and returns them."""
+    context = multiprocessing.get_context("spawn")
+    workers = []
+    for index in range(processes):
+        port = metrics_port + index if metrics_port else 0
+        process = context.Process(target=worker_loop, args=(path, None, port), daemon=True, name="job-worker")
+        process.start()
+        workers.append(process)
+    return workers
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Background job workers for the syllabus researcher.")
+    subcommands = arg_parser.add_subparsers(dest="command", required=True)
+    worker_parser = subcommands.add_parser("worker", help="Run worker processes until interrupted")
+    worker_parser.add_argument("--processes", type=int, default=max(1, JOB_WORKERS))
+    worker_parser.add_argument("--queue", default=JOB_QUEUE_PATH, help="Path of the SQLite job queue")
+    worker_parser.add_argument("--metrics-port", type=int, default=JOB_METRICS_PORT, help="First worker's Prometheus port (one port per process); 0 disables")
+    args = arg_parser.parse_args(argv)
+
+    workers = start_local_workers(args.processes, args.queue, args.metrics_port)
+    print(f"Started {len(workers)} workers on {args.queue}")
+    try:
+        for process in workers:
+            process.join()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,153 @@
+import asyncio
+import functools
+import inspect
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from prometheus_client import Counter, Gauge, Histogram, start_http_server
+
+# Port of the Prometheus endpoint served next to Streamlit; 0 disables it
+METRICS_PORT = int(os.getenv("METRICS_PORT", 9108))
+# Level of the syllabus.trace span lines on stderr; WARNING silences them
+TRACE_LOG_LEVEL = os.getenv("TRACE_LOG_LEVEL", "INFO").upper()
+
+STAGE_LATENCY = Histogram(
+    "syllabus_stage_latency_seconds",
+    "Latency of each pipeline stage",
+    ["stage"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 80),
+)
+STAGE_ERRORS = Counter("syllabus_stage_errors_total", "Pipeline stage calls that raised", ["stage"])
+IN_FLIGHT = Gauge("syllabus_stage_in_flight", "Pipeline stage calls currently running", ["stage"])
+RETRIES = Counter("syllabus_retries_total", "Retries scheduled by tenacity", ["upstream"])
+CACHE_LOOKUPS = Counter("syllabus_cache_lookups_total", "Response cache lookups", ["namespace", "result"])
+HEDGES = Counter("syllabus_hedged_requests_total", "Hedged duplicate requests and which copy answered first", ["upstream", "winner"])
+RATE_LIMIT_QUEUE = Gauge("syllabus_rate_limit_queue_depth", "Calls waiting for a rate-limiter token", ["upstream"])
+LLM_TOKENS = Counter("syllabus_llm_tokens_total", "Gemini tokens, from usage metadata when available", ["kind"])
+
+trace_log = logging.getLogger("syllabus.trace")
+
+# Identifies one pipeline run (a Streamlit session or a batch document) across stages
+current_run_id = ContextVar("current_run_id", default=None)
+
+_server_lock = threading.Lock()
+_server_started = False
+
+
+def configure_tracing(level=TRACE_LOG_LEVEL):
+    """Sends the span lines to stderr; without a handler, logging drops INFO records."""
+    with _server_lock:
+        if trace_log.handlers:
+            return
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(asctime)s %(name)s %(message)s"))
+        trace_log.addHandler(handler)
+        trace_log.setLevel(level)
+        trace_log.propagate = False
+
+
+def start_metrics_server(port=METRICS_PORT):
+    """Serves /metrics on the given port once per process and sets up tracing; later calls are no-ops."""
+    global _server_started
+    configure_tracing()
+    with _server_lock:
+        if _server_started or not port:
+            return False
+        # Not retried: Streamlit calls this again on every rerun
+        _server_started = True
+        try:
+            start_http_server(port)
+        except OSError as e:
+            # e.g. a second local app on the same port; metrics are not worth failing the app for
+            logging.getLogger(__name__).warning("Metrics server not started on port %s: %s", port, e)
+            return False
+        return True
+
+
+def new_run_id():
+    return uuid.uuid4().hex[:12]
+
+
+@contextmanager
+def span(stage, **attributes):
+    """Times one stage: latency histogram, in-flight gauge, error counter and a structured trace line."""
+    start = time.perf_counter()
+    gauge = IN_FLIGHT.labels(stage)
+    gauge.inc()
+    status = "ok"
+    try:
+        yield
+    except GeneratorExit:
+        # A consumer stopping a stream early is not a failure
+        status = "closed"
+        raise
+    except BaseException:
+        status = "error"
+        STAGE_ERRORS.labels(stage).inc()
+        raise
+    finally:
+        duration = time.perf_counter() - start
+        gauge.dec()
+        STAGE_LATENCY.labels(stage).observe(duration)
+        trace_log.info(
+            "span stage=%s run=%s status=%s duration_ms=%.1f%s",
+            stage,
+            current_run_id.get() or "-",
+            status,
+            duration * 1000,
+            "".join(f" {key}={value}" for key, value in attributes.items()),
+        )
+
+
+def instrument(stage):
+    """Decorator wrapping a function, generator or coroutine in span(stage)."""
+    def decorator(fn):
+        if inspect.isasyncgenfunction(fn):
+            raise TypeError("async generators are not supported")
+
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with span(stage):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        if inspect.isgeneratorfunction(fn):
+            @functools.wraps(fn)
+            def generator_wrapper(*args, **kwargs):
+                # The span covers the whole stream, from the first next() to exhaustion
+                with span(stage):
+                    yield from fn(*args, **kwargs)
+            return generator_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+
+    return decorator
+
+
+def count_retry(upstream):
+    """Returns a tenacity before_sleep hook that counts retries for an upstream."""
+    def before_sleep(retry_state):
+        RETRIES.labels(upstream).inc()
+    return before_sleep
+
+
+def record_cache_lookup(namespace, hit):
+    CACHE_LOOKUPS.labels(namespace, "hit" if hit else "miss").inc()
+
+
+def record_hedge(upstream, winner):
+    HEDGES.labels(upstream, winner).inc()
+
+
+def record_tokens(prompt_tokens, response_tokens):
+    LLM_TOKENS.labels("prompt").inc(prompt_tokens or 0)
+    LLM_TOKENS.labels("response").inc(response_tokens or 0)
@@ -1,53 +1,221 @@
-import pypdf
-from pptx import Presentation
-import google.generativeai as genai
+import io
 import os
+import posixpath
 import re
+import multiprocessing
+import tempfile
+import threading
+import zipfile
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
 from google.api_core.exceptions import GoogleAPIError
-from tenacity import retry, wait_exponential, stop_after_attempt, retry_if_exception_type
+from gemini import GeminiAgent, CHARS_PER_TOKEN
+from metrics import instrument
+from deadline import DeadlineExceeded, current_deadline, mark_partial, propagate
 
-class AgentA_Parser:
-    def __init__(self, api_key: str):
-        if not api_key:
-            raise ValueError("Google API Key is required.")
-        genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel('gemini-3-flash-preview')
+# Agent A never reads more than this, so extraction can stop once it is reached. Long documents
+# are analysed chunk by chunk with bounded parallelism, so the cap only guards against pathological uploads
+MAX_ANALYSIS_CHARS = int(os.getenv("ANALYSIS_MAX_CHARS", 1_000_000))
+# Extraction reads one character past the cap, so a document that was cut can be told apart
+EXTRACT_CHAR_BUDGET = MAX_ANALYSIS_CHARS + 1
+TRUNCATED_NOTICE = f"_[Partial result: only the first {MAX_ANALYSIS_CHARS:,} characters of this document were analysed.]_"
 
-    def extract_text(self, uploaded_file):
-        """Extracts text from PDF or PPTX bytes."""
-        extension = uploaded_file.name.split('.')[-1].lower()
-        text = ""
-        
+# Documents longer than one chunk are analysed map-reduce style
+CHUNK_TOKENS = 7500
+ANALYSIS_WORKERS = 4
+# Share of the remaining deadline the map step may use; the rest is kept for the reduce call
+MAP_DEADLINE_SHARE = 0.6
+HEADING_RE = re.compile(r"\n(?=(?:Module|Unit|Chapter|Week|Section|Part|Lecture|MODULE|UNIT|CHAPTER|WEEK)\b|\d+(?:\.\d+)*\.?\s+[A-Z])")
+
+# Page-parallel PDF extraction settings
+PDF_WORKERS = min(4, os.cpu_count() or 1)
+PARALLEL_MIN_PAGES = 16
+PAGE_TIMEOUT_SECONDS = 20
+PAGE_BREAK = "\f"
+# Forking would copy the app's threads and gRPC state into the workers; they start clean instead
+PDF_START_METHOD = os.getenv("PDF_START_METHOD", "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn")
+# Pages in flight across all documents, so concurrent uploads share the pool instead of flooding it
+PDF_MAX_PENDING = PDF_WORKERS * 4
+# PDFs each worker keeps open; pages of one document are spread over all workers
+WORKER_READER_CACHE = 2
+
+_pdf_pool = None
+_pdf_pool_lock = threading.Lock()
+_pdf_slots = threading.BoundedSemaphore(PDF_MAX_PENDING)
+_worker_readers = OrderedDict()
+
+
+def _extract_pdf_page(path, index):
+    """Runs in a pool worker; opens each PDF once and keeps the most recent ones open."""
+    reader = _worker_readers.get(path)
+    if reader is None:
+        import pypdf
+        reader = _worker_readers[path] = pypdf.PdfReader(path)
+        while len(_worker_readers) > WORKER_READER_CACHE:
+            _worker_readers.popitem(last=False)
+    _worker_readers.move_to_end(path)
+    return reader.pages[index].extract_text() or ""
+
+
+def get_pdf_pool():
+    """The process pool shared by every PDF extraction, started on first use."""
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is None:
+            _pdf_pool = multiprocessing.get_context(PDF_START_METHOD).Pool(PDF_WORKERS)
+        return _pdf_pool
+
+
+def _retire_pdf_pool(pool, grace_seconds):
+    """Replaces a pool with a stuck worker; pages already queued on it get grace_seconds to finish."""
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is not pool:
+            return
+        _pdf_pool = None
+    pool.close()
+    timer = threading.Timer(grace_seconds, pool.terminate)
+    timer.daemon = True
+    timer.start()
+
+
+# OOXML namespaces used by the streaming PPTX extractor
+DRAWINGML_NS = "{http://schemas.openxmlformats.org/drawingml/2006/main}"
+PRESENTATIONML_NS = "{http://schemas.openxmlformats.org/presentationml/2006/main}"
+RELATIONSHIPS_NS = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+PACKAGE_RELS_NS = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+NOTES_SLIDE_REL = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/notesSlide"
+
+
+def _pptx_relationships(archive, part_name):
+    """Maps relationship ids of a package part to the archive paths of their targets."""
+    from lxml import etree
+
+    directory, filename = posixpath.split(part_name)
+    rels_name = posixpath.join(directory, "_rels", filename + ".rels")
+    if rels_name not in archive.NameToInfo:
+        return {}
+    with archive.open(rels_name) as f:
+        root = etree.parse(f, etree.XMLParser(resolve_entities=False, no_network=True)).getroot()
+    relationships = {}
+    for rel in root.iter(f"{PACKAGE_RELS_NS}Relationship"):
+        if rel.get("TargetMode") == "External":
+            continue
+        target = rel.get("Target")
+        # Absolute targets are relative to the package root, not to the source part
+        target = target.lstrip("/") if target.startswith("/") else posixpath.join(directory, target)
+        target = posixpath.normpath(target)
+        relationships[rel.get("Id")] = (rel.get("Type"), target)
+    return relationships
+
+
+def _pptx_part_text(archive, part_name):
+    """Streams one slide or notes part and returns its paragraphs, one per line."""
+    from lxml import etree
+
+    paragraphs = []
+    with archive.open(part_name) as f:
+        # Covers text boxes, placeholders, group shapes and table cells alike
+        for _, paragraph in etree.iterparse(f, events=("end",), tag=f"{DRAWINGML_NS}p", resolve_entities=False, no_network=True):
+            # Fields hold slide numbers and dates rather than content
+            text = "".join(
+                node.text or "" for node in paragraph.iter(f"{DRAWINGML_NS}t")
+                if node.getparent().tag != f"{DRAWINGML_NS}fld"
+            ).strip()
+            if text:
+                paragraphs.append(text)
+            paragraph.clear()
+    return "\n".join(paragraphs)
+
+
+def _pptx_slide_parts(archive):
+    """The archive paths of the slides in presentation order; KeyError if the package does not resolve."""
+    from lxml import etree
+
+    presentation = "ppt/presentation.xml"
+    relationships = _pptx_relationships(archive, presentation)
+    with archive.open(presentation) as f:
+        slide_ids = [
+            element.get(f"{RELATIONSHIPS_NS}id")
+            for _, element in etree.iterparse(f, events=("end",), tag=f"{PRESENTATIONML_NS}sldId", resolve_entities=False, no_network=True)
+        ]
+    slide_parts = [relationships[slide_id][1] for slide_id in slide_ids]
+    for slide_part in slide_parts:
+        if slide_part not in archive.NameToInfo:
+            raise KeyError(slide_part)
+    return slide_parts
+
+
+def _iter_pptx_slides_python_pptx(uploaded_file):
+    """Slower fallback for packages the streaming reader cannot resolve; python-pptx follows the package rules."""
+    from pptx import Presentation
+
+    uploaded_file.seek(0)
+    prs = Presentation(uploaded_file)
+    for slide in prs.slides:
+        parts = [shape.text for shape in slide.shapes if hasattr(shape, "text")]
+        if slide.has_notes_slide and slide.notes_slide.notes_text_frame is not None:
+            parts.append(slide.notes_slide.notes_text_frame.text)
+        yield "\n".join(part for part in parts if part)
+
+
+def iter_pptx_slides(uploaded_file):
+    """Yields the text of each slide plus its speaker notes, in presentation order.
+
+    Only the XML parts are read from the zip, so embedded media is never decompressed.
+    """
+    uploaded_file.seek(0)
+    with zipfile.ZipFile(uploaded_file) as archive:
         try:
-            if extension == "pdf":
-                reader = pypdf.PdfReader(uploaded_file)
-                for page in reader.pages:
-                    text += page.extract_text() or ""
-            elif extension in ["pptx", "ppt"]:
-                prs = Presentation(uploaded_file)
-                for slide in prs.slides:
-                    for shape in slide.shapes:
-                        if hasattr(shape, "text"):
-                            text += shape.text + " "
-        except Exception as e:
-            raise Exception(f"Failed to parse document: {str(e)}")
-            
-        return text
+            slide_parts = _pptx_slide_parts(archive)
+        except KeyError:
+            slide_parts = None
+        for slide_part in slide_parts or []:
+            parts = [_pptx_part_text(archive, slide_part)]
+            for rel_type, target in _pptx_relationships(archive, slide_part).values():
+                if rel_type == NOTES_SLIDE_REL and target in archive.NameToInfo:
+                    parts.append(_pptx_part_text(archive, target))
+            yield "\n".join(part for part in parts if part)
+    if slide_parts is None:
+        yield from _iter_pptx_slides_python_pptx(uploaded_file)
 
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=2, min=4, max=15), retry=retry_if_exception_type(GoogleAPIError))
-    def analyze_content(self, raw_text):
-        """Uses LLM to deeply analyze document structure and generate research queries."""
-        
-        # Safely truncate if too large to prevent token explosion
-        safe_text = raw_text[:30000]
-        
-        prompt = f"""
-You are Agent A (The Intelligent Parser).
 
-Your role is to deeply analyze the provided educational document.
-The content may belong to any domain (e.g., Mathematics, Finance, Artificial Intelligence, Computer Science, etc.).
+def is_truncated(text):
+    """True if the extracted text is longer than Agent A reads (page breaks are not counted)."""
+    return len(text) - text.count(PAGE_BREAK) > MAX_ANALYSIS_CHARS
 
-Perform the following tasks carefully and concisely:
+
+def _split_units(text, max_chars):
+    # Prefer page boundaries, then headings, then line breaks, and only then a hard cut
+    for page in text.split(PAGE_BREAK):
+        sections = [page] if len(page) <= max_chars else HEADING_RE.split(page)
+        for section in sections:
+            while len(section) > max_chars:
+                cut = section.rfind("\n", 0, max_chars)
+                if cut <= 0:
+                    cut = max_chars
+                yield section[:cut]
+                section = section[cut:]
+            yield section
+
+
+def chunk_text(text, max_tokens=CHUNK_TOKENS):
+    """Splits text into chunks of at most max_tokens, cutting at page or heading boundaries where possible."""
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    chunks = []
+    current = ""
+    for unit in _split_units(text, max_chars):
+        if current and len(current) + len(unit) + 1 > max_chars:
+            chunks.append(current)
+            current = unit
+        else:
+            current = f"{current}\n{unit}" if current else unit
+    if current.strip():
+        chunks.append(current)
+    return chunks
+
+
+ANALYSIS_TASKS = """Perform the following tasks carefully and concisely:
 
 1. MAIN SUBJECT
    - Identify the single primary subject of the document.
@@ -64,9 +232,9 @@ Perform the following tasks carefully and concisely:
    - Each query must:
        • Include the year "2026"
        • Be designed to find recent advancements, updates, or new research
-       • Be clear, targeted, and suitable for academic or technical search engines
+       • Be clear, targeted, and suitable for academic or technical search engines"""
 
-CRITICAL: Output Format (strictly follow this markdown structure without adding extra text or commentary):
+ANALYSIS_FORMAT = """CRITICAL: Output Format (strictly follow this markdown structure without adding extra text or commentary):
 
 MAIN SUBJECT:
 <subject name>
@@ -97,19 +265,207 @@ SEARCH QUERIES FOR 2026 UPDATES:
 1. "<query 1>"
 2. "<query 2>"
 3. "<query 3>"
-
-DOCUMENT TEXT:
-{safe_text}
 """
+
+
+class AgentA_Parser(GeminiAgent):
+    stage = 'analyze'
+
+    def iter_pages(self, uploaded_file, char_budget=None, token_budget=None, workers=PDF_WORKERS, page_timeout=PAGE_TIMEOUT_SECONDS):
+        """Yields the text of each PDF page or PPTX slide in order, stopping once the budget is full."""
+        limit = char_budget
+        if token_budget is not None:
+            token_chars = token_budget * CHARS_PER_TOKEN
+            limit = token_chars if limit is None else min(limit, token_chars)
+
+        extension = uploaded_file.name.split('.')[-1].lower()
+        remaining = limit
+
+        try:
+            if extension == "pdf":
+                pages = self._iter_pdf_pages(uploaded_file, workers, page_timeout)
+            elif extension in ["pptx", "ppt"]:
+                pages = iter_pptx_slides(uploaded_file)
+            else:
+                return
+
+            try:
+                for page_text in pages:
+                    if remaining is not None:
+                        page_text = page_text[:remaining]
+                        remaining -= len(page_text)
+                    yield page_text
+                    if remaining is not None and remaining <= 0:
+                        return
+            finally:
+                pages.close()
+        except Exception as e:
+            raise Exception(f"Failed to parse document: {str(e)}")
+
+    def _iter_pdf_pages(self, uploaded_file, workers, page_timeout):
+        import pypdf
+
+        uploaded_file.seek(0)
+        pdf_bytes = uploaded_file.read()
+        reader = pypdf.PdfReader(io.BytesIO(pdf_bytes))
+        page_count = len(reader.pages)
+
+        # Small documents are not worth the cost of starting worker processes
+        if workers <= 1 or page_count < PARALLEL_MIN_PAGES:
+            for page in reader.pages:
+                yield page.extract_text() or ""
+            return
+
+        # Workers open the document from disk rather than receiving a copy with every page
+        with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as handle:
+            handle.write(pdf_bytes)
+        pending = {}
+        try:
+            # Keep a bounded window of pages in flight so an early stop wastes little work
+            window = workers * 2
+            next_page = 0
+            for index in range(page_count):
+                while next_page < page_count and next_page < index + window:
+                    # Wait for a slot only when this page is not queued yet, i.e. while holding none;
+                    # read-ahead pages are queued only if the shared pool has room
+                    if not _pdf_slots.acquire(blocking=next_page == index):
+                        break
+                    pool = get_pdf_pool()
+                    pending[next_page] = (pool, pool.apply_async(_extract_pdf_page, (handle.name, next_page)))
+                    next_page += 1
+                pool, result = pending.pop(index)
+                try:
+                    yield result.get(timeout=page_timeout)
+                except multiprocessing.TimeoutError:
+                    # A pathological page should not stall the whole document, nor keep a worker forever
+                    _retire_pdf_pool(pool, page_timeout)
+                    yield ""
+                finally:
+                    _pdf_slots.release()
+        finally:
+            for _ in pending:
+                _pdf_slots.release()
+            os.unlink(handle.name)
+
+    @instrument("extract")
+    def extract_text(self, uploaded_file, char_budget=None, token_budget=None):
+        """Extracts text from PDF or PPTX bytes."""
+        return PAGE_BREAK.join(self.iter_pages(uploaded_file, char_budget=char_budget, token_budget=token_budget))
+
+    @instrument("analyze")
+    def analyze_content(self, raw_text):
+        """Uses LLM to deeply analyze document structure and generate research queries.
+
+        Documents longer than one chunk are analysed chunk by chunk in parallel (map)
+        and the partial notes are merged into the final report with one call (reduce).
+        """
+        try:
+            report = self._generate(self._final_prompt(raw_text))
+            return f"{report}\n\n{TRUNCATED_NOTICE}" if is_truncated(raw_text) else report
+        except (GoogleAPIError, DeadlineExceeded):
+            raise
+        except Exception as e:
+            raise Exception(f"LLM Analysis failed: {str(e)}")
+
+    @instrument("analyze")
+    def analyze_content_stream(self, raw_text):
+        """Same as analyze_content, but yields the final report in chunks as Gemini writes it."""
         try:
-            response = self.model.generate_content(prompt)
-            return response.text
+            yield from self._generate_stream(self._final_prompt(raw_text))
+            if is_truncated(raw_text):
+                yield f"\n\n{TRUNCATED_NOTICE}"
+        except (GoogleAPIError, DeadlineExceeded):
+            raise
         except Exception as e:
             raise Exception(f"LLM Analysis failed: {str(e)}")
 
+    def _final_prompt(self, raw_text):
+        # Hard cap to prevent token explosion on pathological uploads; the reports carry TRUNCATED_NOTICE
+        safe_text = raw_text[:MAX_ANALYSIS_CHARS]
+        chunks = chunk_text(safe_text)
+        if len(chunks) <= 1:
+            return self._analysis_prompt(safe_text)
+
+        deadline = current_deadline.get()
+        pool = ThreadPoolExecutor(max_workers=min(ANALYSIS_WORKERS, len(chunks)))
+        try:
+            analyze_chunk = propagate(self._analyze_chunk)
+            futures = [pool.submit(analyze_chunk, i, chunk, len(chunks)) for i, chunk in enumerate(chunks)]
+            timeout = deadline.remaining() * MAP_DEADLINE_SHARE if deadline is not None else None
+            done, _ = wait(futures, timeout=timeout)
+        finally:
+            # Parts still running when the map step's share of the budget is spent are left behind
+            pool.shutdown(wait=False, cancel_futures=True)
+
+        notes = []
+        for future in futures:
+            if future in done and future.exception() is None:
+                notes.append(future.result())
+            elif future in done:
+                raise future.exception()
+            else:
+                mark_partial(self.stage)
+                notes.append("(Not analysed: the time budget ran out before this part was read.)")
+        return self._reduce_prompt(notes)
+
+    def _analysis_prompt(self, document_text):
+        return f"""
+You are Agent A (The Intelligent Parser).
+
+Your role is to deeply analyze the provided educational document.
+The content may belong to any domain (e.g., Mathematics, Finance, Artificial Intelligence, Computer Science, etc.).
+
+{ANALYSIS_TASKS}
+
+{ANALYSIS_FORMAT}
+DOCUMENT TEXT:
+{document_text}
+"""
+
+    def _analyze_chunk(self, index, chunk, total):
+        """Map step: summarises one part of a long document into compact notes."""
+        prompt = f"""
+You are Agent A (The Intelligent Parser), reading part {index + 1} of {total} of a long educational document.
+
+Write compact notes for this part only (at most 200 words):
+- SUBJECT HINTS: what the overall course appears to be about.
+- TOPICS: every module, unit or topic covered in this part, one line each with a short explanation.
+
+Do not invent content that is not in the text. Do not add commentary.
+
+DOCUMENT PART {index + 1}/{total}:
+{chunk}
+"""
+        return self._generate(prompt)
+
+    def _reduce_prompt(self, notes):
+        """Reduce step: merges per-part notes into the standard Agent A report."""
+        joined = "\n\n".join(f"PART {i + 1} NOTES:\n{note}" for i, note in enumerate(notes))
+        return f"""
+You are Agent A (The Intelligent Parser).
+
+The educational document was too long to read at once, so it was split into {len(notes)} parts
+and each part was summarised below, in document order. Treat the notes together as the whole document,
+giving later parts the same weight as earlier ones.
+
+{ANALYSIS_TASKS}
+
+{ANALYSIS_FORMAT}
+DOCUMENT NOTES:
+{joined}
+"""
+
     def get_search_queries(self, report_text):
         """Extracts the 3 queries from the LLM report using Regex."""
         queries = re.findall(r'"([^"]*2026[^"]*)"', report_text)
 
         # return only first 3 found
         return queries[:3]
+
+    def get_core_topics(self, report_text):
+        """Returns the CORE TOPICS of the report, one string per topic with its explanation."""
+        match = re.search(r"CORE TOPICS:(.*?)(?:SEARCH QUERIES|$)", report_text, re.DOTALL | re.IGNORECASE)
+        if not match:
+            return [report_text] if report_text.strip() else []
+        blocks = re.split(r"\n\s*\d+\.\s+", "\n" + match.group(1).strip())
+        return [re.sub(r"\s+", " ", block).strip() for block in blocks if block.strip()]
@@ -0,0 +1,75 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Shared by all sessions; each prefetch occupies one thread while it runs
+PREFETCH_WORKERS = int(os.getenv("PREFETCH_WORKERS", 8))
+
+_executor = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix="prefetch")
+
+
+class PipelinePrefetcher:
+    """Speculatively runs Agent B (with deep research if enabled) and then Agent C in the background as soon as Agent A is done.
+
+    The results are only used if the user accepts Agent A's queries unchanged. Editing
+    them cancels the prefetch; whatever already ran still warms the agents' caches.
+    """
+
+    def __init__(self, scout, auditor, syllabus_info, format_research, topics=None, sharded_audit=None, deep_research=False):
+        self.scout = scout
+        self.topics = topics
+        self.auditor = auditor
+        self.syllabus_info = syllabus_info
+        self.format_research = format_research
+        self.sharded_audit = sharded_audit
+        self.deep_research = deep_research
+        self.queries = ()
+        self.scout_future = None
+        self.audit_future = None
+        self._cancelled = threading.Event()
+
+    def start(self, queries):
+        """Starts the background search; the audit is chained onto it. Returns self."""
+        self.queries = tuple(queries)
+        self.scout_future = _executor.submit(self._scout)
+        return self
+
+    def _scout(self):
+        web_data = self.scout.search_2026(list(self.queries), topics=self.topics)
+        passages = None
+        if self.deep_research and not self._cancelled.is_set():
+            # The audit must see the same research the interactive path would give it
+            passages = self.scout.deep_research(list(self.queries), topics=self.topics)
+        if not self._cancelled.is_set():
+            self.audit_future = _executor.submit(self._audit, web_data, passages)
+        return web_data, passages
+
+    def _audit(self, web_data, passages):
+        if self._cancelled.is_set():
+            return None
+        return self.auditor.generate_audit_report(self.syllabus_info, self.format_research(web_data, passages), sharded=self.sharded_audit)
+
+    def matches(self, queries):
+        """True if the prefetch was started for exactly these queries and is still live."""
+        return not self._cancelled.is_set() and tuple(queries) == self.queries
+
+    def cancel(self):
+        """Drops the speculative work; anything not yet started will not run."""
+        self._cancelled.set()
+        for future in (self.scout_future, self.audit_future):
+            if future is not None:
+                future.cancel()
+
+    def scout_result(self, timeout=None):
+        """Returns (web_data, passages); passages is None without deep research."""
+        return self.scout_future.result(timeout)
+
+    def audit_result(self, timeout=None):
+        """Waits for the prefetched audit, or returns None if it was never started."""
+        # The timeout covers both waits together
+        expires_at = None if timeout is None else time.monotonic() + timeout
+        self.scout_future.result(timeout)
+        if self.audit_future is None:
+            return None
+        return self.audit_future.result(None if expires_at is None else max(0, expires_at - time.monotonic()))
@@ -0,0 +1,124 @@
+"""Batch-wide query planning: near-duplicate queries from different documents are searched once.
+
+Syllabi of the same subject make Agent A suggest overlapping queries ("2026 machine
+learning trends" and "machine learning industry trends 2026"). The planner clusters the
+queries of every document in a batch as they arrive: a query whose content words overlap
+an earlier query's enough joins that query's cluster, and only one query per cluster is
+sent to Serper. Each document then ranks the shared snippets against its own topics.
+Documents scouted at the same time wait on one in-flight search instead of repeating it.
+"""
+import os
+import re
+import threading
+from collections import defaultdict
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from deadline import current_deadline, mark_partial
+from research import RANK_TOP_K
+from scout import TIMED_OUT_FINDING, build_findings, normalize_query
+
+# Jaccard similarity of content words at or above which two queries share one search
+QUERY_CLUSTER_THRESHOLD = float(os.getenv("QUERY_CLUSTER_THRESHOLD", 0.75))
+
+# Words every "2026" query shares; they say nothing about what is searched
+FILLER_WORDS = frozenset("""
+a an and are for from how in into is latest new of on or the to top trends trend what with
+industry current future emerging modern best 2025 2026 2027
+""".split())
+
+
+def query_terms(query):
+    """The query's content words, without the filler words and years that all queries share."""
+    return frozenset(word for word in re.findall(r"\w+", normalize_query(query)) if word not in FILLER_WORDS)
+
+
+class QueryPlanner:
+    def __init__(self, scout, threshold=QUERY_CLUSTER_THRESHOLD):
+        self.scout = scout
+        self.threshold = threshold
+        # Cluster leaders: the query actually searched for each cluster, with its terms
+        self._leaders = []
+        # Content word -> indexes of the leaders containing it, so only overlapping leaders are compared
+        self._by_term = defaultdict(list)
+        self._assigned = {}
+        # Leader -> Future of its snippets, shared by every document in its cluster
+        self._searches = {}
+        self._lock = threading.Lock()
+        self.requested = 0
+        self.searched = 0
+
+    def _leader_for(self, query):
+        # Called with the lock held
+        normalized = normalize_query(query)
+        if normalized in self._assigned:
+            return self._assigned[normalized]
+        terms = query_terms(query)
+        best, best_similarity = None, self.threshold
+        candidates = {index for term in terms for index in self._by_term[term]}
+        for index in sorted(candidates):
+            leader, leader_terms = self._leaders[index]
+            similarity = len(terms & leader_terms) / len(terms | leader_terms)
+            if similarity >= best_similarity:
+                best, best_similarity = leader, similarity
+        if best is None:
+            # Queries of only filler words never cluster; they still match exact repeats above
+            best = query
+            for term in terms:
+                self._by_term[term].append(len(self._leaders))
+            self._leaders.append((query, terms))
+        self._assigned[normalized] = best
+        return best
+
+    def plan(self, queries):
+        """Returns the query that is actually searched for each of the given queries."""
+        with self._lock:
+            return [self._leader_for(q) for q in queries]
+
+    def search(self, queries, topics=None, top_k=RANK_TOP_K):
+        """Same output as AgentB_Scout.search_2026, drawing on the batch's shared searches."""
+        leaders = self.plan(queries)
+        owned = []
+        with self._lock:
+            self.requested += len(queries)
+            for leader in dict.fromkeys(leaders):
+                if leader not in self._searches:
+                    self._searches[leader] = Future()
+                    owned.append(leader)
+            futures = {leader: self._searches[leader] for leader in leaders}
+
+        if owned:
+            self._run(owned)
+
+        deadline = current_deadline.get()
+        snippets = []
+        for leader in leaders:
+            try:
+                snippets.append(futures[leader].result(timeout=deadline.remaining() if deadline is not None else None))
+            except FutureTimeout:
+                # Another document's search is still running; this one cannot wait for it
+                mark_partial("scout")
+                snippets.append([TIMED_OUT_FINDING])
+        return build_findings(queries, snippets, topics=topics, top_k=top_k)
+
+    def _run(self, leaders):
+        with self._lock:
+            self.searched += len(leaders)
+        try:
+            results = self.scout.search_snippets(leaders)
+        except Exception as e:
+            for leader in leaders:
+                self._forget(leader).set_exception(e)
+            raise
+        for leader, found in zip(leaders, results):
+            # Placeholders depend on the owner's deadline; later documents search again
+            if found[0].startswith(("Search request failed", "Search timed out")):
+                self._forget(leader).set_result(found)
+            else:
+                self._searches[leader].set_result(found)
+
+    def _forget(self, leader):
+        with self._lock:
+            return self._searches.pop(leader)
+
+    def stats(self):
+        with self._lock:
+            return {"requested": self.requested, "searched": self.searched, "clusters": len(self._leaders)}
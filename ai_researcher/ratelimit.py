@@ -0,0 +1,247 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from metrics import RATE_LIMIT_QUEUE
+
+# Shared limits per upstream (override with environment variables)
+GEMINI_REQUESTS_PER_MINUTE = float(os.getenv("GEMINI_REQUESTS_PER_MINUTE", 60))
+GEMINI_TOKENS_PER_MINUTE = float(os.getenv("GEMINI_TOKENS_PER_MINUTE", 1000000))
+SERPER_REQUESTS_PER_MINUTE = float(os.getenv("SERPER_REQUESTS_PER_MINUTE", 300))
+
+# Set to a file path to share the buckets between processes and replicas
+RATE_LIMIT_STATE_PATH = os.getenv("RATE_LIMIT_STATE_PATH", "")
+
+# AIMD tuning: halve the rate on a 429, then creep back up on every success
+DECREASE_FACTOR = 0.5
+INCREASE_STEP = 0.05
+MIN_RATE_FRACTION = 0.1
+
+
+class RateLimiter:
+    """Token-bucket limiter on requests/min and (optionally) tokens/min with AIMD rate adjustment.
+
+    Every caller of an upstream acquires from the same limiter before calling out, so a
+    429 slows all sessions down together instead of each one retrying on its own. With a
+    state_path the bucket lives in SQLite and is shared across processes.
+    """
+
+    def __init__(self, name, requests_per_minute, tokens_per_minute=None, state_path=""):
+        self.name = name
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.state_path = state_path
+        self.waiting = 0
+        self.throttled = 0
+        self.total_wait_seconds = 0.0
+        self._lock = threading.Lock()
+        # Counters have their own lock: _lock is held for a whole SQLite transaction
+        self._stats_lock = threading.Lock()
+        self._queue_gauge = RATE_LIMIT_QUEUE.labels(name)
+        self._state = self._initial_state()
+
+        if state_path:
+            directory = os.path.dirname(state_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(state_path, timeout=30)
+            try:
+                with conn:
+                    conn.execute(
+                        "CREATE TABLE IF NOT EXISTS buckets ("
+                        "name TEXT PRIMARY KEY, requests REAL, tokens REAL, updated_at REAL, "
+                        "rate_fraction REAL, paused_until REAL)"
+                    )
+                    conn.execute(
+                        "INSERT OR IGNORE INTO buckets VALUES (?, ?, ?, ?, ?, ?)",
+                        (name, *self._state.values()),
+                    )
+            finally:
+                conn.close()
+
+    def _initial_state(self):
+        return {
+            "requests": self.requests_per_minute,
+            "tokens": self.tokens_per_minute or 0.0,
+            "updated_at": time.time(),
+            "rate_fraction": 1.0,
+            "paused_until": 0.0,
+        }
+
+    def _update(self, fn):
+        """Applies fn to the bucket state atomically, in memory or in the shared SQLite row."""
+        with self._lock:
+            if not self.state_path:
+                return fn(self._state)
+
+            conn = sqlite3.connect(self.state_path, timeout=30, isolation_level=None)
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                row = conn.execute(
+                    "SELECT requests, tokens, updated_at, rate_fraction, paused_until FROM buckets WHERE name = ?",
+                    (self.name,),
+                ).fetchone()
+                state = dict(zip(self._state.keys(), row))
+                result = fn(state)
+                conn.execute(
+                    "UPDATE buckets SET requests = ?, tokens = ?, updated_at = ?, rate_fraction = ?, paused_until = ? WHERE name = ?",
+                    (*state.values(), self.name),
+                )
+                conn.execute("COMMIT")
+                return result
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            finally:
+                conn.close()
+
+    def _refill(self, state, now):
+        elapsed = max(0.0, now - state["updated_at"])
+        fraction = state["rate_fraction"]
+        state["requests"] = min(self.requests_per_minute, state["requests"] + elapsed * self.requests_per_minute * fraction / 60)
+        if self.tokens_per_minute:
+            state["tokens"] = min(self.tokens_per_minute, state["tokens"] + elapsed * self.tokens_per_minute * fraction / 60)
+        state["updated_at"] = now
+
+    def _try_acquire(self, tokens):
+        """Takes from the bucket if possible; otherwise returns how long to wait before trying again."""
+        # Requests larger than the whole bucket would wait forever, so cap them at its capacity
+        if self.tokens_per_minute:
+            tokens = min(tokens, self.tokens_per_minute)
+
+        def take(state):
+            now = time.time()
+            self._refill(state, now)
+            if state["paused_until"] > now:
+                return state["paused_until"] - now
+
+            fraction = state["rate_fraction"]
+            waits = []
+            if state["requests"] < 1:
+                waits.append((1 - state["requests"]) * 60 / (self.requests_per_minute * fraction))
+            if self.tokens_per_minute and state["tokens"] < tokens:
+                waits.append((tokens - state["tokens"]) * 60 / (self.tokens_per_minute * fraction))
+            if waits:
+                return max(waits)
+
+            state["requests"] -= 1
+            if self.tokens_per_minute:
+                state["tokens"] -= tokens
+            return 0.0
+
+        return self._update(take)
+
+    def _enter_queue(self):
+        with self._stats_lock:
+            self.waiting += 1
+        self._queue_gauge.inc()
+
+    def _leave_queue(self, waited):
+        with self._stats_lock:
+            self.waiting -= 1
+            self.total_wait_seconds += waited
+        self._queue_gauge.dec()
+
+    async def _off_loop(self, fn, *args):
+        # The shared SQLite bucket can block for seconds under contention; keep that off the event loop
+        if not self.state_path:
+            return fn(*args)
+        return await asyncio.to_thread(fn, *args)
+
+    def acquire(self, tokens=1):
+        """Blocks until the call may go out. Returns the number of seconds spent waiting."""
+        waited = 0.0
+        self._enter_queue()
+        try:
+            while True:
+                delay = self._try_acquire(tokens)
+                if delay <= 0:
+                    break
+                # Sleep in short steps so rate increases and other processes' refunds are noticed
+                delay = min(delay, 1.0)
+                time.sleep(delay)
+                waited += delay
+        finally:
+            self._leave_queue(waited)
+        return waited
+
+    async def acquire_async(self, tokens=1):
+        """Async variant of acquire() that never blocks the event loop."""
+        waited = 0.0
+        self._enter_queue()
+        try:
+            while True:
+                delay = await self._off_loop(self._try_acquire, tokens)
+                if delay <= 0:
+                    break
+                delay = min(delay, 1.0)
+                await asyncio.sleep(delay)
+                waited += delay
+        finally:
+            self._leave_queue(waited)
+        return waited
+
+    def on_success(self):
+        """Additive increase after a successful call."""
+        def increase(state):
+            state["rate_fraction"] = min(1.0, state["rate_fraction"] + INCREASE_STEP)
+
+        self._update(increase)
+
+    def on_throttle(self, retry_after=None):
+        """Multiplicative decrease after a 429, pausing everyone for Retry-After seconds if given."""
+        def decrease(state):
+            now = time.time()
+            self._refill(state, now)
+            state["rate_fraction"] = max(MIN_RATE_FRACTION, state["rate_fraction"] * DECREASE_FACTOR)
+            if retry_after:
+                state["paused_until"] = max(state["paused_until"], now + retry_after)
+
+        with self._stats_lock:
+            self.throttled += 1
+        self._update(decrease)
+
+    async def on_success_async(self):
+        await self._off_loop(self.on_success)
+
+    async def on_throttle_async(self, retry_after=None):
+        await self._off_loop(self.on_throttle, retry_after)
+
+    def metrics(self):
+        """Returns queue depth and current effective rates."""
+        fraction = self._update(lambda state: state["rate_fraction"])
+        with self._stats_lock:
+            return {
+                "queue_depth": self.waiting,
+                "requests_per_minute": self.requests_per_minute * fraction,
+                "tokens_per_minute": (self.tokens_per_minute or 0) * fraction,
+                "throttled": self.throttled,
+                "total_wait_seconds": round(self.total_wait_seconds, 3),
+            }
+
+
+def parse_retry_after(value):
+    """Parses a Retry-After header given in seconds; HTTP dates are ignored."""
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+_LIMITS = {
+    "gemini": (GEMINI_REQUESTS_PER_MINUTE, GEMINI_TOKENS_PER_MINUTE),
+    "serper": (SERPER_REQUESTS_PER_MINUTE, None),
+}
+
+
+def get_limiter(name):
+    """Returns the process-wide limiter for an upstream ("gemini" or "serper")."""
+    with _limiters_lock:
+        if name not in _limiters:
+            requests_per_minute, tokens_per_minute = _LIMITS[name]
+            _limiters[name] = RateLimiter(name, requests_per_minute, tokens_per_minute, state_path=RATE_LIMIT_STATE_PATH)
+        return _limiters[name]
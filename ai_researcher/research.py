@@ -0,0 +1,251 @@
+import os
+import re
+import zlib
+from gemini import estimate_tokens
+
+# Upper bound on the research payload handed to Agent C
+RESEARCH_TOKEN_BUDGET = int(os.getenv("RESEARCH_TOKEN_BUDGET", 1500))
+# Separate budget for full-page passages from the optional deep-research stage
+PASSAGE_TOKEN_BUDGET = int(os.getenv("PASSAGE_TOKEN_BUDGET", 1500))
+NEAR_DUPLICATE_THRESHOLD = 0.8
+
+# Local relevance ranking of snippets against Agent A's topics
+RANK_TOP_K = int(os.getenv("RESEARCH_TOP_K", 9))
+HASH_DIMENSIONS = 2 ** 14
+
+# Placeholder for a query whose snippets all duplicate an earlier query's
+SAME_RESULTS_PREFIX = "Same results as query"
+# Placeholders Agent B puts in place of findings; they carry no evidence
+NO_EVIDENCE_PREFIXES = ("No specific results found", "Search request failed", "Search timed out", SAME_RESULTS_PREFIX)
+
+BOILERPLATE_PATTERNS = [
+    # Leading dates such as "Jan 5, 2026 — " or "3 days ago · "
+    re.compile(r"^(?:[A-Z][a-z]{2,8}\.? \d{1,2}, \d{4}|\d+ (?:minutes?|hours?|days?|weeks?|months?) ago)\s*[—–·\-:]+\s*"),
+    re.compile(r"\b(?:Read more|Learn more|Click here|See more|Continue reading)\b\.*", re.IGNORECASE),
+    re.compile(r"(?:\.\.\.|…)\s*$"),
+]
+
+
+def clean_snippet(text):
+    """Strips dates, calls to action and trailing ellipses, and collapses whitespace."""
+    text = re.sub(r"\s+", " ", text or "").strip()
+    for pattern in BOILERPLATE_PATTERNS:
+        text = pattern.sub("", text).strip()
+    return text
+
+
+def _shingles(text, size=3):
+    words = re.findall(r"\w+", text.lower())
+    if len(words) < size:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def _is_near_duplicate(shingles, seen, threshold):
+    for other in seen:
+        union = len(shingles | other)
+        if union and len(shingles & other) / union >= threshold:
+            return True
+    return False
+
+
+def _hashed_term_counts(texts, dimensions=HASH_DIMENSIONS):
+    # Unigrams and bigrams hashed into a fixed-size vector (crc32 is stable across processes)
+    import numpy as np
+
+    counts = np.zeros((len(texts), dimensions), dtype=np.float32)
+    for row, text in enumerate(texts):
+        words = re.findall(r"\w+", text.lower())
+        terms = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+        for term in terms:
+            counts[row, zlib.crc32(term.encode("utf-8")) % dimensions] += 1
+    return counts
+
+
+def relevance_scores(snippets, topics):
+    """Scores each snippet by its best TF-IDF cosine similarity to any topic, in one matrix product."""
+    import numpy as np
+
+    if not snippets or not topics:
+        return np.zeros(len(snippets), dtype=np.float32)
+
+    counts = _hashed_term_counts(list(snippets) + list(topics))
+    document_frequency = np.count_nonzero(counts, axis=0)
+    idf = np.log((1 + len(counts)) / (1 + document_frequency)) + 1
+    weights = np.log1p(counts) * idf
+    norms = np.linalg.norm(weights, axis=1, keepdims=True)
+    weights /= np.where(norms == 0, 1, norms)
+
+    similarity = weights[:len(snippets)] @ weights[len(snippets):].T
+    return similarity.max(axis=1)
+
+
+def rank_findings(web_data, topics, top_k=RANK_TOP_K):
+    """Keeps only the top_k findings across all queries most relevant to the syllabus topics.
+
+    Identical snippets (after cleaning) are ranked once, under the first query that found
+    them. Every query with a unique finding keeps its best one, even if that takes more than
+    top_k findings in total; the remaining slots go to the best findings overall.
+    Placeholders such as failed searches are kept as-is. The result has the same shape
+    as Agent B's output, with each query's surviving findings ordered by relevance.
+    """
+    candidates = []
+    # Cleaned snippet -> index of the first query that found it
+    first_seen = {}
+    duplicate_of = {}
+    for i, result in enumerate(web_data):
+        for finding in result.get("findings", []):
+            if finding and not finding.startswith(NO_EVIDENCE_PREFIXES):
+                key = clean_snippet(finding).lower()
+                if key in first_seen:
+                    duplicate_of.setdefault(i, first_seen[key])
+                    continue
+                first_seen[key] = i
+                candidates.append((i, finding))
+    if not candidates or not topics:
+        return web_data
+
+    import numpy as np
+
+    scores = relevance_scores([finding for _, finding in candidates], topics)
+    order = np.argsort(-scores, kind="stable")
+
+    chosen = []
+    covered = set()
+    for index in order:
+        i, _ = candidates[index]
+        if i not in covered:
+            covered.add(i)
+            chosen.append(index)
+    for index in order:
+        if len(chosen) >= top_k:
+            break
+        if index not in chosen:
+            chosen.append(index)
+
+    ranked = [[] for _ in web_data]
+    # Keep each query's findings in relevance order
+    for index in sorted(chosen, key=lambda index: -scores[index]):
+        i, finding = candidates[index]
+        ranked[i].append(finding)
+
+    output = []
+    for i, (result, findings) in enumerate(zip(web_data, ranked)):
+        placeholders = [f for f in result.get("findings", []) if not f or f.startswith(NO_EVIDENCE_PREFIXES)]
+        if not findings and not placeholders and i in duplicate_of:
+            placeholders = [f'{SAME_RESULTS_PREFIX} "{web_data[duplicate_of[i]].get("query", "")}".']
+        output.append({**result, "findings": findings or placeholders})
+    return output
+
+
+def serialize_research(web_data, token_budget=RESEARCH_TOKEN_BUDGET, threshold=NEAR_DUPLICATE_THRESHOLD):
+    """Turns Agent B's results into a compact, deduplicated payload that fits a token budget.
+
+    Snippets are cleaned, exact and near duplicates (across all queries) are dropped, and
+    the remaining snippets are taken round-robin over the queries so every query gets a
+    fair share of the budget. Returns (payload_text, stats).
+    """
+    seen = []
+    per_query = []
+    duplicates = 0
+    # Why a query ended up without snippets, so Agent C is not told it found nothing
+    only_duplicates = []
+    for result in web_data:
+        kept = []
+        # A query ranked as a duplicate counts as one whose results are all duplicates
+        query_duplicates = sum(1 for f in result.get("findings", []) if f and f.startswith(SAME_RESULTS_PREFIX))
+        for finding in result.get("findings", []):
+            if not finding or finding.startswith(NO_EVIDENCE_PREFIXES):
+                continue
+            snippet = clean_snippet(finding)
+            if not snippet:
+                continue
+            shingles = _shingles(snippet)
+            if _is_near_duplicate(shingles, seen, threshold):
+                duplicates += 1
+                query_duplicates += 1
+                continue
+            seen.append(shingles)
+            kept.append(snippet)
+        per_query.append((result.get("query", ""), kept))
+        only_duplicates.append(query_duplicates > 0 and not kept)
+
+    # Query headers are always included so Agent C knows what was searched
+    used = sum(estimate_tokens(f"Query: {query}") for query, _ in per_query)
+    selected = [[] for _ in per_query]
+    dropped = 0
+    depth = 0
+    while any(depth < len(kept) for _, kept in per_query):
+        for i, (_, kept) in enumerate(per_query):
+            if depth >= len(kept):
+                continue
+            cost = estimate_tokens(f"- {kept[depth]}")
+            if used + cost > token_budget:
+                dropped += 1
+                continue
+            selected[i].append(kept[depth])
+            used += cost
+        depth += 1
+
+    blocks = []
+    for (query, kept), snippets, duplicated in zip(per_query, selected, only_duplicates):
+        lines = [f"Query: {query}"]
+        lines.extend(f"- {snippet}" for snippet in snippets)
+        if duplicated:
+            lines.append("- (same results as the queries above)")
+        elif kept and not snippets:
+            lines.append("- (results left out to fit the length limit)")
+        elif not snippets:
+            lines.append("- (no usable results)")
+        blocks.append("\n".join(lines))
+    payload = "\n\n".join(blocks)
+
+    raw_tokens = estimate_tokens(str(web_data))
+    payload_tokens = estimate_tokens(payload)
+    stats = {
+        "raw_tokens": raw_tokens,
+        "payload_tokens": payload_tokens,
+        "saved_tokens": max(0, raw_tokens - payload_tokens),
+        "duplicates_removed": duplicates,
+        "dropped_for_budget": dropped,
+    }
+    return payload, stats
+
+
+def rank_passages(passages, topics, token_budget=PASSAGE_TOKEN_BUDGET, threshold=NEAR_DUPLICATE_THRESHOLD):
+    """Picks the page passages most relevant to the topics, without near duplicates, within a token budget.
+
+    Takes and returns a list of {"url", "text"} dicts, best first.
+    """
+    if not passages:
+        return []
+    import numpy as np
+
+    if topics:
+        order = np.argsort(-relevance_scores([p["text"] for p in passages], topics), kind="stable")
+    else:
+        order = range(len(passages))
+
+    selected = []
+    seen = []
+    used = 0
+    for index in order:
+        passage = passages[index]
+        shingles = _shingles(passage["text"])
+        if _is_near_duplicate(shingles, seen, threshold):
+            continue
+        cost = estimate_tokens(passage["text"])
+        if used + cost > token_budget:
+            continue
+        seen.append(shingles)
+        selected.append(passage)
+        used += cost
+    return selected
+
+
+def serialize_passages(passages):
+    """Formats ranked passages as an evidence section to append to the research payload ("" if there are none)."""
+    if not passages:
+        return ""
+    evidence = "\n\n".join(f"Source: {p['url']}\n{p['text']}" for p in passages)
+    return f"\n\nFULL-PAGE EVIDENCE:\n{evidence}"
@@ -0,0 +1,129 @@
+import asyncio
+import atexit
+import ipaddress
+import os
+import socket
+import threading
+import aiohttp
+
+# Connection pool settings for the shared scout session (override with environment variables)
+CONNECTOR_LIMIT = int(os.getenv("SCOUT_CONNECTOR_LIMIT", 100))
+CONNECTOR_LIMIT_PER_HOST = int(os.getenv("SCOUT_CONNECTOR_LIMIT_PER_HOST", 20))
+DNS_CACHE_TTL_SECONDS = int(os.getenv("SCOUT_DNS_CACHE_TTL_SECONDS", 300))
+KEEPALIVE_TIMEOUT_SECONDS = float(os.getenv("SCOUT_KEEPALIVE_TIMEOUT_SECONDS", 60))
+
+
+def is_public_address(host):
+    """True if host is an IP address that is reachable on the public internet."""
+    address = ipaddress.ip_address(host.split("%")[0])
+    if isinstance(address, ipaddress.IPv6Address) and address.ipv4_mapped is not None:
+        address = address.ipv4_mapped
+    return address.is_global and not address.is_multicast
+
+
+class PublicResolver(aiohttp.abc.AbstractResolver):
+    """Resolves like aiohttp's default resolver, but refuses hosts with a loopback, link-local or private address.
+
+    Checking the addresses the connector actually connects to also covers redirects and DNS rebinding.
+    """
+
+    def __init__(self):
+        self._resolver = aiohttp.DefaultResolver()
+
+    async def resolve(self, host, port=0, family=socket.AF_INET):
+        hosts = await self._resolver.resolve(host, port, family)
+        if not all(is_public_address(entry["host"]) for entry in hosts):
+            raise OSError(f"{host} resolves to a non-public address")
+        return hosts
+
+    async def close(self):
+        await self._resolver.close()
+
+
+class ScoutRuntime:
+    """A background event-loop thread owning one keep-alive aiohttp session.
+
+    Synchronous callers such as Streamlit script threads hand coroutines to
+    the loop with run() or submit(), so warm searches reuse open connections
+    and never need an event loop of their own.
+    """
+
+    def __init__(self, limit=CONNECTOR_LIMIT, limit_per_host=CONNECTOR_LIMIT_PER_HOST, dns_cache_ttl=DNS_CACHE_TTL_SECONDS, keepalive_timeout=KEEPALIVE_TIMEOUT_SECONDS):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.dns_cache_ttl = dns_cache_ttl
+        self.keepalive_timeout = keepalive_timeout
+        self.pid = os.getpid()
+        self._session = None
+        self._page_session = None
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run_loop, name="scout-runtime", daemon=True)
+        self._thread.start()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_forever()
+
+    @property
+    def loop(self):
+        return self._loop
+
+    async def get_session(self):
+        """Returns the shared session; must be awaited on the runtime loop."""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                ttl_dns_cache=self.dns_cache_ttl,
+                keepalive_timeout=self.keepalive_timeout,
+            )
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+
+    async def get_page_session(self):
+        """Returns the session for fetching arbitrary result pages, which only connects to public addresses."""
+        if self._page_session is None or self._page_session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                ttl_dns_cache=self.dns_cache_ttl,
+                keepalive_timeout=self.keepalive_timeout,
+                resolver=PublicResolver(),
+            )
+            self._page_session = aiohttp.ClientSession(connector=connector)
+        return self._page_session
+
+    def submit(self, coro):
+        """Schedules a coroutine on the runtime loop and returns a concurrent.futures.Future."""
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    def run(self, coro, timeout=None):
+        """Runs a coroutine on the runtime loop and blocks the calling thread until it finishes."""
+        return self.submit(coro).result(timeout)
+
+    def close(self):
+        """Closes the shared session and stops the loop thread."""
+        if not self._loop.is_running():
+            return
+        for session in (self._session, self._page_session):
+            if session is not None:
+                try:
+                    self.run(session.close(), timeout=5)
+                except Exception:
+                    pass
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+
+
+_runtime = None
+_runtime_lock = threading.Lock()
+
+
+def get_runtime():
+    """Returns the process-wide scout runtime, starting it on first use (and again after a fork)."""
+    global _runtime
+    with _runtime_lock:
+        if _runtime is None or _runtime.pid != os.getpid():
+            _runtime = ScoutRuntime()
+            atexit.register(_runtime.close)
+        return _runtime
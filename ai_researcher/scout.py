@@ -1,50 +1,248 @@
-import requests
 import json
 import asyncio
 import aiohttp
+import os
+import re
+import threading
+import time
+from collections import deque
 from tenacity import retry, wait_exponential, stop_after_attempt, retry_if_exception_type
+from cache import get_cache, make_key
+from runtime import get_runtime
+from ratelimit import get_limiter, parse_retry_after
+from research import rank_findings, rank_passages, RANK_TOP_K
+from fetcher import PageFetcher, split_passages
+from metrics import instrument, count_retry, record_hedge
+from deadline import current_deadline, check_deadline, mark_partial, remaining_timeout, stop_before_deadline
+
+SERPER_SEARCH_URL = os.getenv("SERPER_SEARCH_URL", "https://google.serper.dev/search")
+
+# Search results go stale faster than LLM responses
+SERPER_CACHE_TTL_SECONDS = int(os.getenv("SERPER_CACHE_TTL_SECONDS", 24 * 3600))
+
+# Findings kept per query before relevance ranking narrows them down
+MAX_FINDINGS_PER_QUERY = 10
+
+# Longest a single Serper request may take; a pipeline deadline can shorten it further
+SERPER_TIMEOUT_SECONDS = 10
+# A query still unanswered at this percentile of recent latencies gets a duplicate request; 0 disables hedging
+SERPER_HEDGE_PERCENTILE = float(os.getenv("SERPER_HEDGE_PERCENTILE", 95))
+HEDGE_MIN_SAMPLES = 20
+HEDGE_DEFAULT_DELAY_SECONDS = 2.0
+# Uniformly fast latencies would otherwise hedge nearly every request
+HEDGE_MIN_DELAY_SECONDS = 0.25
+
+# Deep research: pages fetched per query and in total
+DEEP_PAGES_PER_QUERY = 2
+DEEP_MAX_PAGES = 10
+
+# Placeholder for queries cut off by the deadline; research.py treats it as no evidence
+TIMED_OUT_FINDING = "Search timed out: the time budget ran out before this query was answered (partial results)."
+
+# Recent successful Serper latencies, shared by all scouts in the process
+_latencies = deque(maxlen=200)
+_latencies_lock = threading.Lock()
+
+
+def record_latency(seconds):
+    with _latencies_lock:
+        _latencies.append(seconds)
+
+
+def hedge_delay(percentile=SERPER_HEDGE_PERCENTILE):
+    """Seconds to wait for a Serper response before sending a hedged duplicate, or None to never hedge."""
+    if not percentile:
+        return None
+    with _latencies_lock:
+        samples = sorted(_latencies)
+    if len(samples) < HEDGE_MIN_SAMPLES:
+        return HEDGE_DEFAULT_DELAY_SECONDS
+    return max(HEDGE_MIN_DELAY_SECONDS, samples[min(len(samples) - 1, int(len(samples) * percentile / 100))])
+
+
+def normalize_query(query):
+    """Lower-cases, drops surrounding quotes and collapses whitespace so equivalent queries share a cache entry."""
+    return re.sub(r"\s+", " ", query.strip().strip("\"'").strip()).lower()
+
+
+def build_findings(queries, snippets, topics=None, top_k=RANK_TOP_K):
+    """Turns per-query snippets into Agent B's output, ranked against the topics when given."""
+    if not topics:
+        return [{"query": q, "findings": found[:3]} for q, found in zip(queries, snippets)]
+
+    results = [{"query": q, "findings": found[:MAX_FINDINGS_PER_QUERY]} for q, found in zip(queries, snippets)]
+    return rank_findings(results, topics, top_k=top_k)
+
 
 class AgentB_Scout:
     def __init__(self, api_key: str):
         if not api_key:
             raise ValueError("Serper API Key is required.")
         self.api_key = api_key
+        self.cache = get_cache("serper", ttl_seconds=SERPER_CACHE_TTL_SECONDS)
+        self.limiter = get_limiter("serper")
+        self.fetcher = PageFetcher()
 
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=2, max=10), retry=retry_if_exception_type(aiohttp.ClientError))
+    @retry(stop=stop_after_attempt(3) | stop_before_deadline, wait=wait_exponential(multiplier=1, min=2, max=10), retry=retry_if_exception_type(aiohttp.ClientError), before_sleep=count_retry("serper"))
+    @instrument("fetch_serper")
     async def fetch_serper_async(self, session, query):
-        url = "https://google.serper.dev/search"
+        url = SERPER_SEARCH_URL
         payload = json.dumps({"q": query})
         headers = {
             'X-API-KEY': self.api_key,
             'Content-Type': 'application/json'
         }
-        async with session.post(url, headers=headers, data=payload, timeout=10) as response:
+        await self.limiter.acquire_async()
+        check_deadline("fetch_serper")
+        start = time.monotonic()
+        async with session.post(url, headers=headers, data=payload, timeout=remaining_timeout(SERPER_TIMEOUT_SECONDS)) as response:
+            if response.status == 429:
+                await self.limiter.on_throttle_async(parse_retry_after(response.headers.get("Retry-After")))
             response.raise_for_status()
-            return await response.json()
+            await self.limiter.on_success_async()
+            data = await response.json()
+        record_latency(time.monotonic() - start)
+        return data
+
+    async def fetch_hedged_async(self, session, query):
+        """Fetches a query, sending a duplicate request if the first is slower than usual; the first answer wins."""
+        primary = asyncio.ensure_future(self.fetch_serper_async(session, query))
+        tasks = {primary}
+        try:
+            delay = hedge_delay()
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if done:
+                return primary.result()
 
-    async def search_2026_async(self, queries):
-        """Goes to the web and returns real-time data for each query asynchronously."""
-        all_results = []
-        
-        async def process_query(session, q):
+            hedge = asyncio.ensure_future(self.fetch_serper_async(session, query))
+            tasks.add(hedge)
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        record_hedge("serper", "hedge" if task is hedge else "primary")
+                        return task.result()
+            # Both copies failed
+            raise primary.exception()
+        finally:
+            # The losing copy (or both, if the caller was cancelled) is not needed any more
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+            # Retrieve every copy's outcome, so a copy that already failed is not logged as never retrieved
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def search_2026_async(self, queries, session=None, topics=None, top_k=RANK_TOP_K):
+        """Goes to the web and returns real-time data for each query asynchronously.
+
+        Pass a shared session to reuse its connections; otherwise a temporary one is opened.
+        With topics (Agent A's CORE TOPICS), only the top_k most relevant findings across
+        all queries are kept; without, each query keeps its first 3 findings.
+        """
+        snippets = await self.fetch_snippets_async(queries, session=session)
+        return build_findings(queries, snippets, topics=topics, top_k=top_k)
+
+    async def fetch_snippets_async(self, queries, session=None):
+        """Returns the raw snippets of each query (a list per query), searching only those not cached."""
+        # Each query is cached on its own, so an edited list only fetches the changed queries
+        keys = [make_key(normalize_query(q)) for q in queries]
+        # The SQLite cache can block on a locked file; look up every key off the shared event loop
+        unique_keys = list(dict.fromkeys(keys))
+        cached = await asyncio.to_thread(lambda: [self.cache.get(key) for key in unique_keys])
+        snippets_by_key = {key: found for key, found in zip(unique_keys, cached) if found is not None}
+
+        async def process_query(session, q, key):
             try:
-                data = await self.fetch_serper_async(session, q)
+                data = await self.fetch_hedged_async(session, q)
                 organic_results = data.get('organic', [])
                 if not organic_results:
                     snippets = ["No specific results found for this query."]
                 else:
                     snippets = [item.get('snippet', '') for item in organic_results]
-                
-                return {"query": q, "findings": snippets[:3]}
+
+                links = [item['link'] for item in organic_results if item.get('link')]
+
+                def store():
+                    self.cache.set(key, snippets)
+                    # Result URLs are kept apart from the snippets, for the optional deep-research stage
+                    self.cache.set(make_key("links", key), links)
+
+                await asyncio.to_thread(store)
+                snippets_by_key[key] = snippets
             except Exception as e:
-                return {"query": q, "findings": [f"Search request failed after retries: {str(e)}"]}
+                snippets_by_key[key] = [f"Search request failed after retries: {str(e)}"]
+
+        missing = {}
+        for q, key in zip(queries, keys):
+            if key not in snippets_by_key and key not in missing:
+                missing[key] = q
+
+        async def process_all(session):
+            tasks = [asyncio.ensure_future(process_query(session, q, key)) for key, q in missing.items()]
+            deadline = current_deadline.get()
+            _, pending = await asyncio.wait(tasks, timeout=deadline.remaining() if deadline is not None else None)
+            if pending:
+                # Return what arrived in time; the rest is labelled rather than waited for
+                mark_partial("scout")
+                for task in pending:
+                    task.cancel()
+                for key in missing:
+                    snippets_by_key.setdefault(key, [TIMED_OUT_FINDING])
+
+        if missing and session is not None:
+            await process_all(session)
+        elif missing:
+            async with aiohttp.ClientSession() as own_session:
+                await process_all(own_session)
+
+        return [snippets_by_key[key] for key in keys]
+
+    async def deep_research_async(self, queries, session, topics=None):
+        """Fetches the top result pages of already-searched queries and returns their best passages.
+
+        Returns a list of {"url", "text"} dicts ranked against the topics; queries whose
+        links are not cached (i.e. not searched yet) contribute nothing.
+        """
+        link_keys = [make_key("links", make_key(normalize_query(q))) for q in queries]
+        cached = await asyncio.to_thread(lambda: [self.cache.get(key) for key in link_keys])
+        urls = []
+        for links in cached:
+            urls.extend((links or [])[:DEEP_PAGES_PER_QUERY])
+        pages = await self.fetcher.fetch_pages_async(session, urls[:DEEP_MAX_PAGES])
+        passages = [
+            {"url": url, "text": passage}
+            for url, paragraphs in pages.items()
+            for passage in split_passages(paragraphs)
+        ]
+        return rank_passages(passages, topics)
+
+    async def _deep_research_on_runtime(self, queries, topics, deadline):
+        current_deadline.set(deadline)
+        session = await get_runtime().get_page_session()
+        return await self.deep_research_async(queries, session, topics=topics)
+
+    @instrument("deep_research")
+    def deep_research(self, queries, topics=None):
+        """Synchronous facade for deep_research_async on the shared scout runtime."""
+        return get_runtime().run(self._deep_research_on_runtime(queries, topics, current_deadline.get()))
+
+    async def _search_on_runtime(self, queries, topics, top_k, deadline):
+        # The runtime's tasks do not inherit the caller's context, so the deadline is handed over
+        current_deadline.set(deadline)
+        session = await get_runtime().get_session()
+        return await self.search_2026_async(queries, session=session, topics=topics, top_k=top_k)
+
+    def search_2026(self, queries, topics=None, top_k=RANK_TOP_K):
+        """Synchronous facade: runs the search on the shared scout runtime and its keep-alive session."""
+        deadline = current_deadline.get()
+        return get_runtime().run(self._search_on_runtime(queries, topics, top_k, deadline))
 
-        async with aiohttp.ClientSession() as session:
-            tasks = [process_query(session, q) for q in queries]
-            all_results = await asyncio.gather(*tasks)
-            
-        return all_results
+    async def _snippets_on_runtime(self, queries, deadline):
+        current_deadline.set(deadline)
+        session = await get_runtime().get_session()
+        return await self.fetch_snippets_async(queries, session=session)
 
-    def search_2026(self, queries):
-        """Wrapper method for backward compatibility."""
-        return asyncio.run(self.search_2026_async(queries))
\ No newline at end of file
+    def search_snippets(self, queries):
+        """Synchronous facade for fetch_snippets_async on the shared scout runtime."""
+        return get_runtime().run(self._snippets_on_runtime(queries, current_deadline.get()))
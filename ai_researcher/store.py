@@ -0,0 +1,240 @@
+"""Bounded, compressed store for per-session pipeline results.
+
+Reports and web findings are kept outside st.session_state so resident memory stays
+flat under load: entries are compressed once they pass a size threshold, the least
+recently used ones are spilled to disk when the global memory cap is reached, and
+anything idle for longer than the TTL is dropped. A returning user (same session id)
+still finds results that were spilled to disk.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+try:
+    import zstandard
+except ImportError:
+    # Optional: zstd compresses reports faster and smaller, zlib is the fallback
+    zstandard = None
+
+RESULT_STORE_MAX_BYTES = int(os.getenv("RESULT_STORE_MAX_MB", 64)) * 1024 * 1024
+RESULT_STORE_TTL_SECONDS = int(os.getenv("RESULT_STORE_TTL_SECONDS", 6 * 3600))
+RESULT_STORE_SPILL_DIR = os.getenv("RESULT_STORE_SPILL_DIR", os.path.join(tempfile.gettempdir(), "syllabus-results"))
+# Smaller values are stored as plain JSON; compressing them saves too little
+COMPRESS_MIN_BYTES = 1024
+SWEEP_INTERVAL_SECONDS = 300
+
+CODEC_RAW = b"r"
+CODEC_ZLIB = b"z"
+CODEC_ZSTD = b"s"
+
+
+def encode(value):
+    """Serializes a JSON-compatible value, compressing it when it is large enough."""
+    data = json.dumps(value, ensure_ascii=False).encode("utf-8")
+    if len(data) < COMPRESS_MIN_BYTES:
+        return CODEC_RAW + data
+    if zstandard is not None:
+        return CODEC_ZSTD + zstandard.ZstdCompressor(level=3).compress(data)
+    return CODEC_ZLIB + zlib.compress(data, 6)
+
+
+def decode(blob):
+    codec, data = blob[:1], blob[1:]
+    if codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise RuntimeError("Result was stored with zstd, but zstandard is not installed.")
+        data = zstandard.ZstdDecompressor().decompress(data)
+    elif codec == CODEC_ZLIB:
+        data = zlib.decompress(data)
+    return json.loads(data.decode("utf-8"))
+
+
+class ResultStore:
+    def __init__(self, max_bytes=RESULT_STORE_MAX_BYTES, ttl_seconds=RESULT_STORE_TTL_SECONDS, spill_dir=RESULT_STORE_SPILL_DIR):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.spill_dir = spill_dir
+        # (session_id, key) -> (blob, last access), least recently used first
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._last_sweep = time.time()
+        self.spills = 0
+        self.evictions = 0
+        os.makedirs(spill_dir, exist_ok=True)
+
+    def _spill_prefix(self, session_id):
+        return hashlib.sha256(session_id.encode("utf-8")).hexdigest()[:32]
+
+    def _spill_path(self, session_id, key):
+        key_hash = hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
+        return os.path.join(self.spill_dir, f"{self._spill_prefix(session_id)}-{key_hash}")
+
+    def _remove(self, entry_key):
+        blob, _ = self._entries.pop(entry_key)
+        self._bytes -= len(blob)
+
+    def _spill_over_cap(self):
+        # Called with the lock held; the newest entry always stays resident
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            entry_key, (blob, _) = next(iter(self._entries.items()))
+            self._remove(entry_key)
+            path = self._spill_path(*entry_key)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(blob)
+            os.replace(tmp_path, path)
+            self.spills += 1
+
+    def _sweep(self, now):
+        # Called with the lock held, at most every SWEEP_INTERVAL_SECONDS
+        if now - self._last_sweep < SWEEP_INTERVAL_SECONDS:
+            return
+        self._last_sweep = now
+        for entry_key in [k for k, (_, accessed) in self._entries.items() if now - accessed > self.ttl_seconds]:
+            self._remove(entry_key)
+            self.evictions += 1
+        for name in os.listdir(self.spill_dir):
+            path = os.path.join(self.spill_dir, name)
+            try:
+                if now - os.path.getmtime(path) > self.ttl_seconds:
+                    os.remove(path)
+                    self.evictions += 1
+            except OSError:
+                # Another thread or process may have removed it first
+                pass
+
+    def set(self, session_id, key, value):
+        blob = encode(value)
+        now = time.time()
+        # A stale spilled copy must not resurface once the new value is evicted
+        self._remove_spilled(self._spill_path(session_id, key))
+        with self._lock:
+            entry_key = (session_id, key)
+            if entry_key in self._entries:
+                self._remove(entry_key)
+            self._entries[entry_key] = (blob, now)
+            self._bytes += len(blob)
+            self._spill_over_cap()
+            self._sweep(now)
+
+    @staticmethod
+    def _remove_spilled(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def contains(self, session_id, key):
+        """Like get() without decoding the value."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get((session_id, key))
+            if entry is not None:
+                return now - entry[1] <= self.ttl_seconds
+        try:
+            return now - os.path.getmtime(self._spill_path(session_id, key)) <= self.ttl_seconds
+        except OSError:
+            return False
+
+    def get(self, session_id, key, default=None):
+        now = time.time()
+        entry_key = (session_id, key)
+        with self._lock:
+            entry = self._entries.get(entry_key)
+            if entry is not None:
+                blob, accessed = entry
+                if now - accessed <= self.ttl_seconds:
+                    self._entries[entry_key] = (blob, now)
+                    self._entries.move_to_end(entry_key)
+                    return decode(blob)
+                self._remove(entry_key)
+                self.evictions += 1
+                return default
+
+        path = self._spill_path(session_id, key)
+        try:
+            if now - os.path.getmtime(path) > self.ttl_seconds:
+                os.remove(path)
+                self.evictions += 1
+                return default
+            with open(path, "rb") as f:
+                blob = f.read()
+        except OSError:
+            return default
+        # Bring it back into memory; it is the most recently used entry now
+        self._remove_spilled(path)
+        with self._lock:
+            if entry_key not in self._entries:
+                self._entries[entry_key] = (blob, now)
+                self._bytes += len(blob)
+                self._spill_over_cap()
+        return decode(blob)
+
+    def delete(self, session_id, key):
+        with self._lock:
+            if (session_id, key) in self._entries:
+                self._remove((session_id, key))
+        self._remove_spilled(self._spill_path(session_id, key))
+
+    def delete_session(self, session_id):
+        """Drops every result of a session, in memory and on disk."""
+        with self._lock:
+            for entry_key in [k for k in self._entries if k[0] == session_id]:
+                self._remove(entry_key)
+        prefix = self._spill_prefix(session_id) + "-"
+        for name in os.listdir(self.spill_dir):
+            if name.startswith(prefix):
+                self._remove_spilled(os.path.join(self.spill_dir, name))
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._bytes, "spills": self.spills, "evictions": self.evictions}
+
+
+class SessionResults:
+    """Dict-style view of one session's entries in a ResultStore."""
+
+    def __init__(self, store, session_id):
+        self.store = store
+        self.session_id = session_id
+
+    def __getitem__(self, key):
+        value = self.store.get(self.session_id, key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        self.store.set(self.session_id, key, value)
+
+    def __delitem__(self, key):
+        self.store.delete(self.session_id, key)
+
+    def __contains__(self, key):
+        return self.store.contains(self.session_id, key)
+
+    def get(self, key, default=None):
+        return self.store.get(self.session_id, key, default)
+
+    def clear(self):
+        self.store.delete_session(self.session_id)
+
+
+_MISSING = object()
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_result_store():
+    """Returns the process-wide result store."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ResultStore()
+        return _store